@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, "..", "pipelines"))
+from utils.data import clean_df, convertDecimals, convertBytes
+from fake_subgraph import ASSETS, to_bytes32
+
+
+def make_trades(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    assets = rng.choice(ASSETS, num_rows)
+    decimals = {
+        col: [str(x) for x in rng.integers(-10**17, 10**17, num_rows) * 10**5]
+        for col in ['price', 'margin', 'feesPaid', 'pnl', 'size', 'positionSize']
+    }
+    return pd.DataFrame({
+        'timestamp': [str(x) for x in 1_660_000_000 + np.arange(num_rows)],
+        'asset': [to_bytes32(asset) for asset in assets],
+        'marketKey': [to_bytes32(f"{asset}PERP") for asset in assets],
+        **decimals,
+    })
+
+
+def clean_df_per_cell(df, types):
+    """The original row-by-row implementation, kept as the baseline"""
+    for col in df.columns:
+        type = types[col]
+        if type == 'decimal':
+            df[col] = df[col].apply(convertDecimals)
+        elif type == 'bytes':
+            df[col] = df[col].apply(convertBytes)
+    return df
+
+
+def time_clean(fn, df, types):
+    df = df.copy()
+    start = time.perf_counter()
+    result = fn(df, types)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the vectorized clean_df against the per-cell implementation")
+    parser.add_argument('-n', '--rows', required=False, type=int, default=1_000_000,
+                        help="Number of synthetic trade rows")
+    args = parser.parse_args()
+
+    with open(os.path.join(BENCHMARKS_DIR, '..', 'pipelines', 'configs', 'trades.json'), 'r') as file:
+        types = json.load(file)['graphql_types']
+
+    df = make_trades(args.rows)
+    baseline_time, baseline = time_clean(clean_df_per_cell, df, types)
+    vectorized_time, vectorized = time_clean(clean_df, df, types)
+
+    for col in df.columns:
+        if types[col] == 'decimal':
+            np.testing.assert_allclose(
+                vectorized[col].to_numpy(), baseline[col].to_numpy(dtype=float), rtol=1e-15)
+        else:
+            assert vectorized[col].equals(baseline[col]), col
+
+    print(f"ROWS: {args.rows}")
+    print(f"PER CELL: {baseline_time:.2f}s ({args.rows / baseline_time:,.0f} rows/s)")
+    print(f"VECTORIZED: {vectorized_time:.2f}s ({args.rows / vectorized_time:,.0f} rows/s)")
+    print(f"SPEEDUP: {baseline_time / vectorized_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,592 @@
+import os
+import sys
+import json
+import time
+import zlib
+import bisect
+import random
+import asyncio
+import argparse
+import numpy as np
+from aiohttp import web
+from graphql import build_schema, graphql_sync, parse
+from graphql.language import ast
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipelines"))
+from utils.subgraph import MAX_PAGE_SIZE
+
+# Synthetic rows start here and are spread over `days`, one block every 2s
+BASE_TIMESTAMP = 1_690_000_000
+BASE_BLOCK = 100_000_000
+SECONDS_PER_BLOCK = 2
+
+# Rows scanned at a time when looking for the rows of a page
+CHUNK_SIZE = 4096
+
+ASSETS = ['sETH', 'sBTC', 'sLINK', 'sSOL', 'sAVAX', 'sOP', 'sMATIC', 'sDOGE']
+
+# Entities queried by stats.py, the pipeline entities are read from their configs
+STATS_ENTITIES = {
+    'orderSettleds': {
+        'fields': {
+            'id': 'string', 'timestamp': 'number', 'marketId': 'number', 'accountId': 'number',
+            'fillPrice': 'decimal', 'sizeDelta': 'decimal', 'totalFees': 'decimal',
+        },
+    },
+    'perpsV3AggregateStats': {
+        'fields': {
+            'id': 'string', 'timestamp': 'number', 'period': 'number', 'marketId': 'number',
+            'volume': 'decimal', 'trades': 'number',
+        },
+        'choices': {'period': [3600, 86400], 'marketId': [0, 100, 200]},
+    },
+    'futuresAggregateStats': {
+        'fields': {
+            'id': 'string', 'timestamp': 'number', 'period': 'number', 'asset': 'bytes',
+            'volume': 'decimal', 'trades': 'number', 'feesSynthetix': 'decimal', 'feesKwenta': 'decimal',
+        },
+        'choices': {'period': [3600, 86400], 'asset': ['0x'] + ASSETS},
+    },
+}
+
+GRAPHQL_TYPES = {
+    'string': 'String',
+    'decimal': 'BigInt',
+    'number': 'BigInt',
+    'bytes': 'Bytes',
+    'boolean': 'Boolean',
+}
+
+FILTER_OPS = ['', '_not', '_gt', '_lt', '_gte', '_lte', '_in', '_not_in']
+BOOLEAN_FILTER_OPS = ['', '_not', '_in', '_not_in']
+
+
+def to_bytes32(text):
+    return '0x' + text.encode().ljust(32, b'\x00').hex()
+
+
+def mix(x):
+    """splitmix64, a cheap vectorized hash of uint64 arrays"""
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+class VirtualIds:
+    """The sorted ids of an entity, computed on access so bisect can search them"""
+
+    def __init__(self, entity):
+        self.entity = entity
+
+    def __len__(self):
+        return self.entity.num_rows
+
+    def __getitem__(self, rank):
+        return self.entity.get_id(rank)
+
+
+class Entity:
+    """A synthetic entity whose rows are computed from their rank, so any size costs no memory.
+
+    Rows have a time rank, giving their timestamp and block, and an id rank,
+    giving their id. Ids are spread evenly over the hex keyspace like
+    transaction hashes, and the two ranks are related by a permutation, so the
+    id order and the time order of rows are unrelated.
+    """
+
+    def __init__(self, name, fields, num_rows, choices={}, days=90, seed=0):
+        self.name = name
+        self.fields = fields
+        self.num_rows = num_rows
+        self.choices = choices
+        self.span = days * 86400
+        self.seed = seed
+        self.step = 2**256 // max(num_rows, 1)
+        self.ids = VirtualIds(self)
+
+        # id rank = (multiplier * time rank + offset) mod num_rows
+        n = max(num_rows, 1)
+        self.multiplier = max(1, int(n * 0.618))
+        while np.gcd(self.multiplier, n) != 1:
+            self.multiplier += 1
+        self.inverse = pow(self.multiplier, -1, n) if n > 1 else 0
+        self.offset = seed % n
+
+    def get_id(self, rank):
+        return f"0x{int(rank) * self.step:064x}"
+
+    def get_time_ranks(self, id_ranks):
+        return (self.inverse * (id_ranks - self.offset)) % max(self.num_rows, 1)
+
+    def get_id_ranks(self, time_ranks):
+        return (self.multiplier * time_ranks + self.offset) % max(self.num_rows, 1)
+
+    def get_timestamps(self, time_ranks):
+        return BASE_TIMESTAMP + time_ranks * self.span // max(self.num_rows, 1)
+
+    def get_first_rank(self, timestamp):
+        """Return the first time rank at or after a timestamp"""
+        rank = -(-(int(timestamp) - BASE_TIMESTAMP) * self.num_rows // self.span)
+        return min(max(rank, 0), self.num_rows)
+
+    def get_blocks(self, time_ranks):
+        return BASE_BLOCK + (self.get_timestamps(time_ranks) - BASE_TIMESTAMP) // SECONDS_PER_BLOCK
+
+    def get_head_block(self):
+        return BASE_BLOCK + self.span // SECONDS_PER_BLOCK
+
+    def get_hashes(self, field, time_ranks):
+        salt = zlib.crc32(f"{self.seed}:{field}".encode()) << 32
+        return mix(time_ranks.astype(np.uint64) ^ np.uint64(salt))
+
+    def get_column(self, field, time_ranks, id_ranks):
+        """Return the values of a field for some rows, as numpy arrays of numbers or strings"""
+        kind = self.fields[field]
+        if field == 'id':
+            return np.array([self.get_id(rank) for rank in id_ranks], dtype=object)
+        if field == 'timestamp':
+            return self.get_timestamps(time_ranks)
+
+        # marketKey follows asset, so both describe the same market
+        hashes = self.get_hashes('asset' if field == 'marketKey' else field, time_ranks)
+        if field in self.choices:
+            choices = np.array(self.choices[field], dtype=object)
+            return choices[(hashes % np.uint64(len(choices))).astype(np.int64)]
+        if kind == 'number':
+            return (hashes % np.uint64(1_000_000)).astype(np.int64)
+        if kind == 'boolean':
+            return (hashes & np.uint64(1)).astype(bool)
+        if kind == 'decimal':
+            # Signed values below 10^4 with 18 decimals
+            return np.array(
+                [f"{'-' if int(h) & 1 else ''}{(int(h) >> 1) % 10**18 * 10**4}" for h in hashes], dtype=object)
+        if kind == 'bytes':
+            assets = np.array(ASSETS, dtype=object)[(hashes % np.uint64(len(ASSETS))).astype(np.int64)]
+            suffix = 'PERP' if field == 'marketKey' else ''
+            return np.array([to_bytes32(f"{asset}{suffix}") for asset in assets], dtype=object)
+        if field.lower().endswith('account') or field in ['keeper', 'trader']:
+            return np.array([f"0x{int(h) % 1000:040x}" for h in hashes], dtype=object)
+        if field.lower().endswith('hash'):
+            return np.array(['0x' + f"{int(h):016x}" * 4 for h in hashes], dtype=object)
+        return np.array([f"{field}{int(h) % 4}" for h in hashes], dtype=object)
+
+    def get_mask(self, where, time_ranks, id_ranks):
+        """Evaluate a graph-node `where` filter on some rows"""
+        mask = np.ones(len(time_ranks), dtype=bool)
+        for key, value in where.items():
+            if key == 'or':
+                branches = np.zeros(len(time_ranks), dtype=bool)
+                for branch in value:
+                    branches |= self.get_mask(branch, time_ranks, id_ranks)
+                mask &= branches
+            elif key == 'and':
+                for branch in value:
+                    mask &= self.get_mask(branch, time_ranks, id_ranks)
+            elif key == '_change_block':
+                mask &= self.get_blocks(time_ranks) >= int(value['number_gte'])
+            else:
+                field, op = split_filter(key)
+                if field not in self.fields:
+                    raise ValueError(f"Unknown filter `{key}` on {self.name}")
+                mask &= self.compare(field, op, value, time_ranks, id_ranks)
+        return mask
+
+    def get_exact_rank(self, value):
+        rank = bisect.bisect_left(self.ids, value)
+        return rank if rank < self.num_rows and self.get_id(rank) == value else -1
+
+    def compare(self, field, op, value, time_ranks, id_ranks):
+        if field == 'id':
+            # Ids sort as strings in rank order, so bounds become rank bounds
+            values = id_ranks
+            if op in ['_in', '_not_in']:
+                value = [self.get_exact_rank(v) for v in value]
+            elif op in ['', '_not']:
+                value = self.get_exact_rank(value)
+            else:
+                op, value = {
+                    '_gt': ('_gte', bisect.bisect_right(self.ids, value)),
+                    '_gte': ('_gte', bisect.bisect_left(self.ids, value)),
+                    '_lt': ('_lt', bisect.bisect_left(self.ids, value)),
+                    '_lte': ('_lt', bisect.bisect_right(self.ids, value)),
+                }[op]
+        elif self.fields[field] == 'number' or field == 'timestamp':
+            values = self.get_column(field, time_ranks, id_ranks)
+            value = [int(v) for v in value] if op in ['_in', '_not_in'] else int(value)
+        else:
+            values = self.get_column(field, time_ranks, id_ranks)
+        return apply_op(values, op, value)
+
+    def get_bounds(self, where, field):
+        """Return the lowest and highest value of a field a filter can match, None when unbounded"""
+        lower, upper = None, None
+        for key, value in where.items():
+            if key in ['or', 'and']:
+                bounds = [self.get_bounds(branch, field) for branch in value]
+                if key == 'and':
+                    branch_lower = max([b[0] for b in bounds if b[0] is not None], default=None)
+                    branch_upper = min([b[1] for b in bounds if b[1] is not None], default=None)
+                else:
+                    lowers = [b[0] for b in bounds]
+                    uppers = [b[1] for b in bounds]
+                    branch_lower = None if None in lowers or len(lowers) == 0 else min(lowers)
+                    branch_upper = None if None in uppers or len(uppers) == 0 else max(uppers)
+                lower = tighten(lower, branch_lower, max)
+                upper = tighten(upper, branch_upper, min)
+            elif key != '_change_block':
+                key_field, op = split_filter(key)
+                if key_field != field:
+                    continue
+                value = int(value) if field == 'timestamp' else value
+                if op in ['', '_gt', '_gte']:
+                    lower = tighten(lower, value, max)
+                if op in ['', '_lt', '_lte']:
+                    upper = tighten(upper, value, min)
+        return lower, upper
+
+    def scan(self, where, order_by):
+        """Yield chunks of (time ranks, id ranks) in `order_by` order, skipping rows the bounds rule out"""
+        if order_by == 'id':
+            lower, upper = self.get_bounds(where, 'id')
+            start = 0 if lower is None else bisect.bisect_left(self.ids, lower)
+            end = self.num_rows if upper is None else bisect.bisect_right(self.ids, upper)
+            for chunk_start in range(start, end, CHUNK_SIZE):
+                id_ranks = np.arange(chunk_start, min(chunk_start + CHUNK_SIZE, end), dtype=np.int64)
+                yield self.get_time_ranks(id_ranks), id_ranks
+        else:
+            lower, upper = self.get_bounds(where, 'timestamp')
+            start = 0 if lower is None else self.get_first_rank(lower)
+            end = self.num_rows if upper is None else self.get_first_rank(upper + 1)
+            while start < end:
+                # Chunks end on a timestamp boundary, so ties are sorted by id together
+                stop = min(start + CHUNK_SIZE, end)
+                if stop < end:
+                    last_timestamp = int(self.get_timestamps(np.int64(stop - 1)))
+                    stop = min(end, self.get_first_rank(last_timestamp + 1))
+                time_ranks = np.arange(start, stop, dtype=np.int64)
+                id_ranks = self.get_id_ranks(time_ranks)
+                order = np.lexsort((id_ranks, self.get_timestamps(time_ranks)))
+                yield time_ranks[order], id_ranks[order]
+                start = stop
+
+    def query(self, where=None, order_by='id', order_direction='asc', first=100, skip=0):
+        """Return the (time ranks, id ranks) of a page of rows"""
+        where = where or {}
+        if order_by not in ['id', 'timestamp'] or order_by not in self.fields:
+            raise ValueError(f"The fake subgraph can't order {self.name} by {order_by}")
+        if order_direction != 'asc':
+            raise ValueError("The fake subgraph only supports ascending order")
+        if first < 0 or first > MAX_PAGE_SIZE:
+            raise ValueError(f"The `first` argument must be between 0 and {MAX_PAGE_SIZE}, but is {first}")
+
+        time_ranks, id_ranks = [], []
+        found = 0
+        for chunk_time_ranks, chunk_id_ranks in self.scan(where, order_by):
+            mask = self.get_mask(where, chunk_time_ranks, chunk_id_ranks)
+            time_ranks.append(chunk_time_ranks[mask])
+            id_ranks.append(chunk_id_ranks[mask])
+            found += int(mask.sum())
+            if found >= skip + first:
+                break
+        if len(time_ranks) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return (np.concatenate(time_ranks)[skip:skip + first],
+                np.concatenate(id_ranks)[skip:skip + first])
+
+    def get_rows(self, fields, time_ranks, id_ranks):
+        columns = []
+        for field in fields:
+            if field not in self.fields:
+                raise ValueError(f"Unknown field `{field}` on {self.name}")
+            values = self.get_column(field, time_ranks, id_ranks)
+            if self.fields[field] == 'boolean':
+                columns.append([bool(value) for value in values])
+            else:
+                # graph-node serializes BigInt values as strings
+                columns.append([str(value) for value in values])
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+
+def tighten(bound, value, pick):
+    if value is None:
+        return bound
+    return value if bound is None else pick(bound, value)
+
+
+def split_filter(key):
+    """Split a filter like `timestamp_gte` into its field and operator"""
+    field, _, op = key.partition('_')
+    return field, f"_{op}" if op else ''
+
+
+def apply_op(values, op, value):
+    if op == '':
+        return values == value
+    if op == '_not':
+        return values != value
+    if op == '_gt':
+        return values > value
+    if op == '_gte':
+        return values >= value
+    if op == '_lt':
+        return values < value
+    if op == '_lte':
+        return values <= value
+    if op == '_in':
+        return np.isin(values, np.array(value, dtype=values.dtype))
+    if op == '_not_in':
+        return ~np.isin(values, np.array(value, dtype=values.dtype))
+    raise ValueError(f"Unsupported filter operator `{op}`")
+
+
+def get_type_name(entity_name):
+    return entity_name[0].upper() + entity_name[1:].rstrip('s')
+
+
+def get_schema_sdl(entities):
+    """Write a graph-node style schema for the entities, used to answer introspection queries"""
+    types = []
+    query_fields = []
+    for entity in entities.values():
+        type_name = get_type_name(entity.name)
+        fields, filters = [], []
+        for field, kind in entity.fields.items():
+            graphql_type = 'ID' if field == 'id' else GRAPHQL_TYPES[kind]
+            fields.append(f"{field}: {graphql_type}!")
+            for op in (BOOLEAN_FILTER_OPS if kind == 'boolean' else FILTER_OPS):
+                filter_type = f"[{graphql_type}!]" if op in ['_in', '_not_in'] else graphql_type
+                filters.append(f"{field}{op}: {filter_type}")
+        types.append(f"type {type_name} {{ {' '.join(fields)} }}")
+        types.append(f"enum {type_name}_orderBy {{ {' '.join(entity.fields)} }}")
+        types.append(f"""input {type_name}_filter {{
+            {' '.join(filters)}
+            _change_block: BlockChangedFilter
+            and: [{type_name}_filter]
+            or: [{type_name}_filter]
+        }}""")
+        query_fields.append(f"""{entity.name}(
+            skip: Int = 0, first: Int = 100, orderBy: {type_name}_orderBy,
+            orderDirection: OrderDirection, where: {type_name}_filter
+        ): [{type_name}!]!""")
+
+    return f"""
+        scalar BigInt
+        scalar BigDecimal
+        scalar Bytes
+        enum OrderDirection {{ asc desc }}
+        input BlockChangedFilter {{ number_gte: Int! }}
+        type _Block_ {{ number: Int! hash: Bytes timestamp: Int }}
+        type _Meta_ {{ block: _Block_! deployment: String! hasIndexingErrors: Boolean! }}
+        {' '.join(types)}
+        type Query {{
+            {' '.join(query_fields)}
+            _meta: _Meta_
+        }}
+    """
+
+
+def get_value(node, variables):
+    if isinstance(node, ast.VariableNode):
+        return variables.get(node.name.value)
+    if isinstance(node, ast.IntValueNode):
+        return int(node.value)
+    if isinstance(node, ast.FloatValueNode):
+        return float(node.value)
+    if isinstance(node, ast.NullValueNode):
+        return None
+    if isinstance(node, ast.ListValueNode):
+        return [get_value(value, variables) for value in node.values]
+    if isinstance(node, ast.ObjectValueNode):
+        return {field.name.value: get_value(field.value, variables) for field in node.fields}
+    return node.value
+
+
+def select(value, selection_set):
+    if selection_set is None or value is None:
+        return value
+    return {
+        (field.alias or field.name).value: select(value[field.name.value], field.selection_set)
+        for field in selection_set.selections
+    }
+
+
+def execute(schema, entities, query, variables):
+    """Answer a query like graph-node, with graphql-core only for introspection"""
+    document = parse(query)
+    operation = [
+        definition for definition in document.definitions
+        if isinstance(definition, ast.OperationDefinitionNode)][0]
+    selections = operation.selection_set.selections
+    if any(field.name.value.startswith('__') for field in selections):
+        result = graphql_sync(schema, query, variable_values=variables)
+        if result.errors:
+            return {'data': result.data, 'errors': [{'message': error.message} for error in result.errors]}
+        return {'data': result.data}
+
+    data = {}
+    for field in selections:
+        name = field.name.value
+        key = (field.alias or field.name).value
+        if name == '_meta':
+            head_block = max(entity.get_head_block() for entity in entities.values())
+            meta = {
+                'deployment': 'QmFakeSubgraph',
+                'hasIndexingErrors': False,
+                'block': {
+                    'number': head_block,
+                    'hash': f"0x{head_block:064x}",
+                    'timestamp': BASE_TIMESTAMP + (head_block - BASE_BLOCK) * SECONDS_PER_BLOCK,
+                },
+            }
+            data[key] = select(meta, field.selection_set)
+        elif name in entities:
+            args = {argument.name.value: get_value(argument.value, variables) for argument in field.arguments}
+            entity = entities[name]
+            time_ranks, id_ranks = entity.query(
+                where=args.get('where'),
+                order_by=args.get('orderBy') or 'id',
+                order_direction=args.get('orderDirection') or 'asc',
+                first=100 if args.get('first') is None else args['first'],
+                skip=args.get('skip') or 0)
+            fields = [selection.name.value for selection in field.selection_set.selections]
+            data[key] = entity.get_rows(fields, time_ranks, id_ranks)
+        else:
+            raise ValueError(f"Type `Query` has no field `{name}`")
+    return {'data': data}
+
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def get_retry_after(self):
+        # Retry-After is in whole seconds
+        return max(1, int(np.ceil((1 - self.tokens) / self.rate)))
+
+
+def load_entities(num_rows=100_000, entity_rows={}, days=90, seed=0):
+    """Describe every entity of the pipeline configs and stats.py, with `num_rows` rows each
+    unless `entity_rows` says otherwise"""
+    specs = dict(STATS_ENTITIES)
+    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pipelines', 'configs')
+    for name in sorted(os.listdir(config_dir)):
+        with open(os.path.join(config_dir, name), 'r') as file:
+            config = json.load(file)
+        if 'graphql_entity' in config:
+            specs[config['graphql_entity']] = {'fields': config['graphql_types']}
+
+    return {
+        name: Entity(
+            name, spec['fields'], entity_rows.get(name, num_rows),
+            choices=spec.get('choices', {}), days=days, seed=seed)
+        for name, spec in specs.items()
+    }
+
+
+def create_app(entities, latency=0, row_latency=0, rate_limit=None, error_rate=0, seed=0):
+    """Serve the entities at every path, with injected latency, rate limiting and errors.
+
+    Requests take `latency` seconds on average plus `row_latency` per row
+    returned. Requests above `rate_limit` per second get a 429 with a
+    Retry-After header, and a fraction `error_rate` of the rest fail with a
+    500. Counters are served at GET /stats.
+    """
+    schema = build_schema(get_schema_sdl(entities))
+    bucket = TokenBucket(rate_limit) if rate_limit else None
+    rng = random.Random(seed)
+    stats = {'requests': 0, 'rows': 0, 'throttled': 0, 'errors': 0}
+
+    async def handle_query(request):
+        payload = await request.json()
+        stats['requests'] += 1
+        if bucket is not None and not bucket.take():
+            stats['throttled'] += 1
+            return web.Response(
+                status=429, text='Too Many Requests', headers={'Retry-After': str(bucket.get_retry_after())})
+        if rng.random() < error_rate:
+            stats['errors'] += 1
+            return web.Response(status=500, text='Internal Server Error')
+
+        try:
+            result = execute(schema, entities, payload['query'], payload.get('variables') or {})
+        except (KeyError, ValueError, TypeError) as error:
+            result = {'data': None, 'errors': [{'message': str(error)}]}
+        rows = sum(len(value) for value in (result['data'] or {}).values() if isinstance(value, list))
+        stats['rows'] += rows
+
+        delay = latency * rng.uniform(0.5, 1.5) + row_latency * rows
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return web.json_response(result)
+
+    async def handle_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=16 * 1024**2)
+    app['stats'] = stats
+    app.router.add_get('/stats', handle_stats)
+    app.router.add_post('/{path:.*}', handle_query)
+    return app
+
+
+async def start_server(app, host='127.0.0.1', port=0):
+    """Start serving an app in the running event loop, returning the runner and its url"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve synthetic subgraph entities for offline benchmarks")
+    parser.add_argument('--host', required=False, default='127.0.0.1')
+    parser.add_argument('-p', '--port', required=False, type=int, default=8000)
+    parser.add_argument('-n', '--rows', required=False, type=int, default=100_000,
+                        help="Number of rows of every entity")
+    parser.add_argument('--entity-rows', required=False, action='append', default=[],
+                        help="Number of rows of one entity, e.g. futuresTrades=1000000")
+    parser.add_argument('--days', required=False, type=int, default=90,
+                        help="Number of days the rows are spread over")
+    parser.add_argument('--latency', required=False, type=float, default=0,
+                        help="Average seconds added to every request")
+    parser.add_argument('--row-latency', required=False, type=float, default=0,
+                        help="Seconds added to a request per row returned")
+    parser.add_argument('--rate-limit', required=False, type=float,
+                        help="Requests per second served before answering 429")
+    parser.add_argument('--error-rate', required=False, type=float, default=0,
+                        help="Fraction of requests answered with a 500")
+    parser.add_argument('--seed', required=False, type=int, default=0)
+    args = parser.parse_args()
+
+    entity_rows = {}
+    for value in args.entity_rows:
+        name, _, num_rows = value.partition('=')
+        entity_rows[name] = int(num_rows)
+    entities = load_entities(args.rows, entity_rows, days=args.days, seed=args.seed)
+    app = create_app(
+        entities, latency=args.latency, row_latency=args.row_latency,
+        rate_limit=args.rate_limit, error_rate=args.error_rate, seed=args.seed)
+
+    print(f"SERVING {', '.join(entities)} ON http://{args.host}:{args.port}/")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
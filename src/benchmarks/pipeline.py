@@ -0,0 +1,260 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, "..", "pipelines"))
+sys.path.append(os.path.join(BENCHMARKS_DIR, "..", "scripts"))
+from utils.metrics import METRICS
+from utils.subgraph import open_session
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get_peak_rss_mb():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes on Linux
+    return peak_rss / 1024**2 if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_fake_subgraph(num_rows, args):
+    """Serve the fake subgraph from its own process, so it doesn't share the benchmark's CPU or memory"""
+    port = get_free_port()
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIR, 'fake_subgraph.py'),
+        '--port', str(port), '--rows', str(num_rows),
+        '--latency', str(args.latency), '--error-rate', str(args.error_rate),
+    ]
+    if args.rate_limit is not None:
+        command += ['--rate-limit', str(args.rate_limit)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{port}/"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{url}stats")
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("The fake subgraph didn't start")
+
+
+def get_server_stats(url):
+    with urllib.request.urlopen(f"{url}stats") as response:
+        return json.load(response)
+
+
+async def bench_export(url, args):
+    """Backfill one entity with export_to_sqlite.sync_entity.
+
+    The stage times are the ones the pipeline records in its metrics. Pages
+    are fetched while earlier ones are cleaned and inserted, so the stages
+    overlap and can add up to more than the wall time.
+    """
+    import export_to_sqlite
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+    sync_args = argparse.Namespace(
+        backfill=True, shards=args.shards, concurrency=args.concurrency, batch_size=args.batch_size,
+        parquet_dir=None)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = dict(config, graphql_url=url, database_file=os.path.join(tmp_dir, 'benchmark.db'))
+        metrics_file = os.path.join(tmp_dir, 'metrics.jsonl')
+        with METRICS.run('benchmark', metrics_file):
+            async with open_session(url, max_concurrency=args.max_requests) as session:
+                db = export_to_sqlite.Database(config['database_file'], bulk_load=True)
+                try:
+                    await export_to_sqlite.sync_entity(
+                        config, session, db, export_to_sqlite.RefreshBatch(session, 0), sync_args)
+                    num_rows = await db.run(
+                        lambda conn: conn.execute(f"SELECT COUNT(*) FROM {config['table_name']}").fetchone()[0])
+                finally:
+                    db.close()
+
+        stages = {}
+        with open(metrics_file, 'r') as file:
+            for line in file:
+                event = json.loads(line)
+                if event['event'] == 'stage':
+                    stages[event['stage']] = stages.get(event['stage'], 0) + event['seconds']
+    return num_rows, stages
+
+
+async def bench_stats(url, args):
+    """Run the v3 daily stats export, splitting subgraph fetches from the pandas aggregation"""
+    import stats
+
+    stages = {'fetch': 0}
+    run_recursive_query = stats.run_recursive_query
+    num_rows = 0
+
+    async def timed_recursive_query(*query_args):
+        nonlocal num_rows
+        start = time.perf_counter()
+        result = await run_recursive_query(*query_args)
+        stages['fetch'] += time.perf_counter() - start
+        num_rows += len(result)
+        return result
+
+    stats.run_recursive_query = timed_recursive_query
+    stats.CONFIGS['v3']['subgraph_endpoint'] = url
+
+    # stats.py writes its output under the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            start = time.perf_counter()
+            await stats.main('v3')
+            stages['aggregate'] = time.perf_counter() - start - stages['fetch']
+        finally:
+            os.chdir(cwd)
+    return num_rows, stages
+
+
+def run_one(args):
+    """Run one benchmark in this process and print its result as JSON"""
+    benchmarks = {'export': bench_export, 'stats': bench_stats}
+    start = time.perf_counter()
+    num_rows, stages = asyncio.run(benchmarks[args.run_one](args.url, args))
+    wall_time = time.perf_counter() - start
+    print(json.dumps({
+        'rows': num_rows,
+        'wall_time': wall_time,
+        'rows_per_second': num_rows / wall_time if wall_time > 0 else None,
+        'peak_rss_mb': get_peak_rss_mb(),
+        'stages': stages,
+    }))
+
+
+def run_suite(args):
+    results = []
+    # Every run gets a new port, so keep their schemas out of the shared cache
+    schema_cache = tempfile.TemporaryDirectory()
+    env = dict(os.environ, SCHEMA_CACHE_DIR=schema_cache.name)
+    for num_rows in args.sizes:
+        server, url = start_fake_subgraph(num_rows, args)
+        try:
+            for benchmark in args.benchmarks:
+                print(f"RUNNING {benchmark} WITH {num_rows} ROWS")
+                before = get_server_stats(url)
+                # A fresh process per run keeps peak RSS to that run
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__), '--run-one', benchmark, '--url', url,
+                    '--config', args.config, '--shards', str(args.shards),
+                    '--concurrency', str(args.concurrency), '--max-requests', str(args.max_requests),
+                    '--batch-size', str(args.batch_size),
+                ], text=True, env=env)
+                result = json.loads(output.strip().splitlines()[-1])
+                after = get_server_stats(url)
+                server_stats = {key: after[key] - before[key] for key in after}
+                result.update({'benchmark': benchmark, 'size': num_rows, 'server': server_stats})
+                results.append(result)
+                print(
+                    f"{benchmark.upper()} {num_rows}: {result['wall_time']:.2f}s, "
+                    f"{result['rows_per_second'] or 0:,.0f} rows/s, {result['peak_rss_mb']:.0f}MB peak RSS, "
+                    + ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in result['stages'].items()))
+        finally:
+            server.terminate()
+            server.wait()
+    schema_cache.cleanup()
+    return results
+
+
+def compare(results, baseline_file):
+    with open(baseline_file, 'r') as file:
+        baseline = json.load(file)
+    baseline_results = {(result['benchmark'], result['size']): result for result in baseline['results']}
+    print(f"COMPARED WITH {baseline.get('commit')}")
+    for result in results:
+        old = baseline_results.get((result['benchmark'], result['size']))
+        if old is None or not old['rows_per_second'] or not result['rows_per_second']:
+            continue
+        print(
+            f"{result['benchmark'].upper()} {result['size']}: "
+            f"{result['rows_per_second'] / old['rows_per_second']:.2f}x rows/s, "
+            f"{result['peak_rss_mb'] / old['peak_rss_mb']:.2f}x peak RSS")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the export and stats pipelines end to end against the fake subgraph")
+    parser.add_argument('--sizes', required=False, type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Numbers of rows per entity to run with")
+    parser.add_argument('--benchmarks', required=False, nargs='+', default=['export', 'stats'],
+                        choices=['export', 'stats'])
+    parser.add_argument('-c', '--config', required=False,
+                        default=os.path.join(BENCHMARKS_DIR, '..', 'pipelines', 'configs', 'trades.json'),
+                        help="Config of the entity exported")
+    parser.add_argument('-s', '--shards', required=False, type=int, default=16)
+    parser.add_argument('--concurrency', required=False, type=int, default=4)
+    parser.add_argument('--max-requests', required=False, type=int, default=8)
+    parser.add_argument('--batch-size', required=False, type=int, default=10000)
+    parser.add_argument('--latency', required=False, type=float, default=0,
+                        help="Average seconds the fake subgraph adds to every request")
+    parser.add_argument('--rate-limit', required=False, type=float,
+                        help="Requests per second the fake subgraph serves before answering 429")
+    parser.add_argument('--error-rate', required=False, type=float, default=0,
+                        help="Fraction of requests the fake subgraph answers with a 500")
+    parser.add_argument('-o', '--output', required=False, default='pipeline_benchmark.json',
+                        help="File the results are saved to")
+    parser.add_argument('--compare', required=False,
+                        help="Results file of an earlier run to compare against")
+    parser.add_argument('--run-one', required=False, choices=['export', 'stats'], help=argparse.SUPPRESS)
+    parser.add_argument('--url', required=False, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        run_one(args)
+        return
+
+    results = run_suite(args)
+    with open(args.output, 'w') as file:
+        json.dump({
+            'commit': get_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'settings': {
+                key: getattr(args, key) for key in [
+                    'config', 'shards', 'concurrency', 'max_requests', 'batch_size',
+                    'latency', 'rate_limit', 'error_rate']
+            },
+            'results': results,
+        }, file, indent=2)
+    print(f"SAVED RESULTS TO {args.output}")
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, "..", "pipelines"))
+from utils.data import clean_df
+from utils.db import connect, insert_rows
+from clean_df import make_trades
+
+
+def create_table(conn, table_name, fields):
+    fields_sql = ', '.join([f"{key} {value}" for key, value in fields.items()])
+    conn.execute(f"CREATE TABLE {table_name} ({fields_sql})")
+
+
+def insert_baseline(database_file, table_name, fields, df):
+    """The original insert path: default pragmas, iterrows and one transaction"""
+    conn = sqlite3.connect(database_file)
+    create_table(conn, table_name, fields)
+    columns = list(df.columns)
+
+    start = time.perf_counter()
+    data_to_insert = [tuple(event[1].values) for event in df.iterrows()]
+    placeholders = ', '.join(['?' for _ in columns])
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", data_to_insert)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+
+    conn.close()
+    return elapsed
+
+
+def insert_bulk_load(database_file, table_name, fields, df, batch_size):
+    """The bulk-load profile: tuned pragmas, generator-fed executemany and chunked transactions"""
+    conn = connect(database_file, bulk_load=True)
+    create_table(conn, table_name, fields)
+    columns = list(df.columns)
+
+    start = time.perf_counter()
+    for i in range(0, df.shape[0], batch_size):
+        insert_rows(conn, table_name, columns,
+                    df.iloc[i:i + batch_size].itertuples(index=False, name=None))
+        conn.commit()
+    elapsed = time.perf_counter() - start
+
+    conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare SQLite insert throughput of the default and bulk-load profiles")
+    parser.add_argument('-n', '--rows', required=False, type=int, default=1_000_000,
+                        help="Number of synthetic trade rows")
+    parser.add_argument('--batch-size', required=False, type=int, default=10000,
+                        help="Rows per transaction in the bulk-load profile")
+    args = parser.parse_args()
+
+    with open(os.path.join(BENCHMARKS_DIR, '..', 'pipelines', 'configs', 'trades.json'), 'r') as file:
+        config = json.load(file)
+
+    df = clean_df(make_trades(args.rows), config['graphql_types'])
+    df.insert(0, 'id', [f"0x{i:064x}-0" for i in range(args.rows)])
+    fields = {col: config['fields'][col] for col in df.columns}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        baseline_time = insert_baseline(
+            os.path.join(tmp_dir, 'baseline.db'), 'trades', fields, df)
+        bulk_time = insert_bulk_load(
+            os.path.join(tmp_dir, 'bulk.db'), 'trades', fields, df, args.batch_size)
+
+    print(f"ROWS: {args.rows}")
+    print(f"BASELINE: {baseline_time:.2f}s ({args.rows / baseline_time:,.0f} rows/s)")
+    print(f"BULK LOAD: {bulk_time:.2f}s ({args.rows / bulk_time:,.0f} rows/s)")
+    print(f"SPEEDUP: {baseline_time / bulk_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,18 @@
+import os
+import time
 import asyncio
 import json
-import sqlite3
 import argparse
+from contextlib import AsyncExitStack
 import pandas as pd
-from gql import Client, gql
-from gql.transport.aiohttp import AIOHTTPTransport
+from gql import gql
 import nest_asyncio
-from utils.data import clean_df
-from copy import deepcopy
+from utils.data import decode_pages
+from utils.subgraph import open_session, get_head_block, MAX_PAGE_SIZE
+from utils.query import get_column_scales, save_column_scales
+from utils.db import connect, close, insert_rows, sync_indexes
+from utils.parquet import get_day, get_stored_days, has_dataset, write_partitions
+from utils.metrics import METRICS
 
 nest_asyncio.apply()
 
@@ -17,167 +22,577 @@ def read_config(config_file):
         return json.load(file)
 
 
+def read_configs(paths):
+    """Read every entity config from a list of config files and directories"""
+    config_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            config_files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json')))
+        else:
+            config_files.append(path)
+
+    # Only subgraph entity configs can be synced by this script
+    configs = [read_config(config_file) for config_file in config_files]
+    return [config for config in configs if 'graphql_entity' in config]
+
+
+class Database:
+    """A SQLite connection shared by concurrent entity syncs.
+
+    Each call runs in a worker thread so fetching continues while a batch is
+    cleaned and written, and the lock keeps one transaction open at a time.
+    """
+
+    def __init__(self, database_file, bulk_load=False):
+        self.conn = connect(database_file, bulk_load=bulk_load, check_same_thread=False)
+        self.lock = asyncio.Lock()
+
+    async def run(self, fn, *args):
+        async with self.lock:
+            return await asyncio.to_thread(fn, self.conn, *args)
+
+    def close(self):
+        close(self.conn)
+
+
 def create_table(cursor, table_name, fields):
     fields_sql = ', '.join([f"{key} {value}" for key, value in fields.items()])
     cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
     cursor.execute(f"CREATE TABLE {table_name} ({fields_sql})")
 
 
-def get_last_ts(conn, table_name):
-    df_last_ts = pd.read_sql_query(f"SELECT timestamp FROM {table_name} ORDER BY timestamp DESC LIMIT 1", conn)
-    if(df_last_ts.shape[0] != 1):
-        last_ts = ''
-    else:
-        last_ts = df_last_ts['timestamp'][0]
-    return last_ts
+def get_last_cursor(conn, table_name):
+    """Return the (timestamp, id) of the newest row, the keyset cursor a refresh resumes after"""
+    df_last = pd.read_sql_query(
+        f"SELECT timestamp, id FROM {table_name} ORDER BY timestamp DESC, id DESC LIMIT 1", conn)
+    if(df_last.shape[0] != 1):
+        return 0, ''
+    return int(df_last['timestamp'][0]), df_last['id'][0]
 
 
-async def run_query(query, params, url):
-    transport = AIOHTTPTransport(url=url)
+def table_exists(conn, table_name):
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    return cursor.fetchone() is not None
 
-    async with Client(
-        transport=transport,
-        fetch_schema_from_transport=True,
-    ) as session:
 
-        # Execute single query
-        query = query
+def get_shadow_table(table_name):
+    return f"{table_name}_backfill"
 
-        result = await session.execute(query, variable_values=params)
-        df = pd.DataFrame(result)
-        return df
 
+def create_sync_state(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            table_name TEXT,
+            shard_lower TEXT,
+            shard_upper TEXT,
+            last_id TEXT,
+            PRIMARY KEY (table_name, shard_lower)
+        )
+    """)
+    # The subgraph block each table is known to be synced up to
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_watermarks (
+            table_name TEXT PRIMARY KEY,
+            block INTEGER
+        )
+    """)
 
-async def run_refresh_query(query, params, accessor, url):
-    transport = AIOHTTPTransport(url=url)
 
-    async with Client(
-        transport=transport,
-        fetch_schema_from_transport=True,
-    ) as session:
-        done_fetching = False
-        all_results = []
-        last_result = None
-        while not done_fetching:
-            result = await session.execute(query, variable_values=params)
-            if result != last_result:
-                all_results.extend(result[accessor])
-                params['last_ts'] = all_results[-1]['timestamp']
-                last_result = deepcopy(result)
-            else:
-                done_fetching = True
-
-        df = pd.DataFrame(all_results)
-        return df
+def get_watermark(conn, table_name):
+    cursor = conn.execute("SELECT block FROM sync_watermarks WHERE table_name = ?", (table_name,))
+    row = cursor.fetchone()
+    return row[0] if row is not None else None
 
 
-async def run_backfill_query(query, params, accessor, url):
-    transport = AIOHTTPTransport(url=url)
+def save_watermark(conn, table_name, block):
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_watermarks (table_name, block) VALUES (?, ?)", (table_name, block))
+    conn.commit()
 
-    async with Client(
-        transport=transport,
-        fetch_schema_from_transport=True,
-    ) as session:
-        done_fetching = False
-        all_results = []
-        while not done_fetching:
-            result = await session.execute(query, variable_values=params)
-            if len(result[accessor]) > 0:
-                all_results.extend(result[accessor])
-                params['last_id'] = all_results[-1]['id']
-            else:
-                done_fetching = True
 
-        df = pd.DataFrame(all_results)
-        return df
+def get_backfill_shards(conn, table_name):
+    """Return the saved (lower, upper, last_id) cursor of every shard of an unfinished backfill"""
+    if not table_exists(conn, get_shadow_table(table_name)):
+        return []
+    cursor = conn.execute(
+        "SELECT shard_lower, shard_upper, last_id FROM sync_state WHERE table_name = ? ORDER BY shard_lower",
+        (table_name,))
+    return cursor.fetchall()
 
 
-async def main():
-    parser = argparse.ArgumentParser(
-        description="Export data from a GraphQL API to an SQLite database")
-    parser.add_argument('-c', '--config', required=True,
-                        help="Path to the JSON configuration file")
-    parser.add_argument('-b', '--backfill', required=False, type=bool,
-                        help="Remove the table and backfill from the beginning")
-    args = parser.parse_args()
+def start_backfill(conn, table_name, fields, num_shards, start_block):
+    cursor = conn.cursor()
+    create_table(cursor, get_shadow_table(table_name), fields)
+    cursor.execute("DELETE FROM sync_state WHERE table_name = ?", (table_name,))
+    # Everything changed since the backfill started is picked up by the next
+    # incremental sync, so that is the table's watermark once it's swapped in
+    cursor.execute(
+        "INSERT OR REPLACE INTO sync_watermarks (table_name, block) VALUES (?, ?)",
+        (get_shadow_table(table_name), start_block))
+    shards = [(lower, upper, lower) for lower, upper in get_shard_bounds(num_shards)]
+    cursor.executemany(
+        "INSERT INTO sync_state (table_name, shard_lower, shard_upper, last_id) VALUES (?, ?, ?, ?)",
+        [(table_name, *shard) for shard in shards])
+    conn.commit()
+    return shards
+
+
+def save_backfill_cursors(conn, table_name, cursors):
+    conn.executemany(
+        "UPDATE sync_state SET last_id = ? WHERE table_name = ? AND shard_lower = ?",
+        [(last_id, table_name, lower) for lower, last_id in cursors.items()])
+
+
+def swap_backfill_table(conn, table_name, scales, indexes):
+    # DDL is transactional in SQLite, so readers see either the old table
+    # or the complete new one, with its indexes and the scales it was stored
+    # with. The shadow table is loaded without secondary indexes, which are
+    # built here once instead of being updated on every insert.
+    conn.execute("BEGIN")
+    conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+    conn.execute(f"ALTER TABLE {get_shadow_table(table_name)} RENAME TO {table_name}")
+    sync_indexes(conn, table_name, indexes)
+    conn.execute("DELETE FROM sync_state WHERE table_name = ?", (table_name,))
+    conn.execute("DELETE FROM sync_watermarks WHERE table_name = ?", (table_name,))
+    conn.execute(
+        "UPDATE sync_watermarks SET table_name = ? WHERE table_name = ?",
+        (table_name, get_shadow_table(table_name)))
+    save_column_scales(conn, table_name, scales)
+    conn.commit()
 
-    config = read_config(args.config)
+
+async def run_query(query, params, url):
+    async with open_session(url) as session:
+
+        # Execute single query
+        query = query
+
+        result = await session.execute(query, variable_values=params)
+        df = pd.DataFrame(result)
+        return df
+
+
+def get_refresh_selection(graphql_entity, query_fields, prefix=''):
+    # graph-node breaks timestamp ties by id, so (timestamp, id) is a total
+    # order and the cursor resumes exactly after the last row seen
+    return f"""
+        {prefix}{graphql_entity}: {graphql_entity}(
+            where: {{
+                or: [
+                    {{ timestamp_gt: ${prefix}last_ts }},
+                    {{ timestamp: ${prefix}last_ts, id_gt: ${prefix}last_id }}
+                ]
+            }}
+            orderBy: timestamp
+            orderDirection: asc
+            first: $first
+        ) {{
+            {query_fields}
+        }}
+    """
+
+
+def get_refresh_query(entities):
+    """Build one document with an aliased refresh selection per (prefix, graphql_entity, query_fields)"""
+    variables = ', '.join(
+        f"${prefix}last_ts: BigInt!, ${prefix}last_id: ID!" for prefix, _, _ in entities)
+    selections = ''.join(
+        get_refresh_selection(graphql_entity, query_fields, prefix)
+        for prefix, graphql_entity, query_fields in entities)
+    return gql(f"""
+        query(
+            {variables}, $first: Int!
+        ) {{
+        {selections}
+        }}
+    """)
+
+
+class RefreshBatch:
+    """Refreshes several entities of one endpoint with a single aliased query per request.
+
+    Every entity registers its cursor through `pages`. Once all `size` of them
+    have, each request fetches the next page of every entity still in the
+    batch, and an entity drops out after its first short page.
+    """
+
+    def __init__(self, session, size):
+        self.session = session
+        self.size = size
+        self.entities = []
+        self.queries = {}
+        self.task = None
+
+    async def pages(self, graphql_entity, query_fields, params):
+        # A small queue lets one slow writer hold back the batch rather than
+        # buffer an unbounded backlog
+        queue = asyncio.Queue(maxsize=2)
+        prefix = f"e{len(self.entities)}_"
+        self.entities.append((prefix, graphql_entity, query_fields, params, queue))
+        if len(self.entities) == self.size:
+            self.task = asyncio.ensure_future(self.fetch())
+
+        while True:
+            page = await queue.get()
+            METRICS.set_queue_depth(graphql_entity, queue.qsize())
+            if page is None:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield None, page
+
+    def get_query(self, active):
+        key = tuple(prefix for prefix, _, _, _, _ in active)
+        if key not in self.queries:
+            self.queries[key] = get_refresh_query(
+                [(prefix, graphql_entity, query_fields)
+                 for prefix, graphql_entity, query_fields, _, _ in active])
+        return self.queries[key]
+
+    async def fetch(self):
+        active = list(self.entities)
+        try:
+            while len(active) > 0:
+                variables = {'first': MAX_PAGE_SIZE}
+                for prefix, _, _, params, _ in active:
+                    variables[f"{prefix}last_ts"] = params['last_ts']
+                    variables[f"{prefix}last_id"] = params['last_id']
+                result = await self.session.execute(self.get_query(active), variable_values=variables)
+
+                remaining = []
+                for entity in active:
+                    prefix, graphql_entity, _, params, queue = entity
+                    page = result[f"{prefix}{graphql_entity}"]
+                    if len(page) > 0:
+                        await queue.put(page)
+                        params['last_ts'] = page[-1]['timestamp']
+                        params['last_id'] = page[-1]['id']
+                    # The page size is set by the fetch controller on every request
+                    if len(page) < variables['first']:
+                        await queue.put(None)
+                    else:
+                        remaining.append(entity)
+                active = remaining
+        except Exception as error:
+            for _, _, _, _, queue in active:
+                await queue.put(error)
+
+
+def get_shard_bounds(num_shards):
+    """Split the id keyspace into contiguous (lower, upper) ranges.
+
+    Entity ids are 0x-prefixed hex strings, so fixed-width hex prefixes make
+    lexicographic bounds. The first range has no lower bound and the last has
+    no upper bound, so every id falls into exactly one range.
+    """
+    if num_shards <= 1:
+        return [('', None)]
+
+    width = 1
+    while 16 ** width < num_shards:
+        width += 1
+    prefixes = [
+        f"0x{(i * 16 ** width) // num_shards:0{width}x}" for i in range(1, num_shards)]
+    return list(zip([''] + prefixes, prefixes + [None]))
+
+
+def get_backfill_query(graphql_entity, query_fields, bounded=False, changed=False):
+    upper_var = ', $upper_id: ID!' if bounded else ''
+    upper_filter = 'id_lt: $upper_id' if bounded else ''
+    # graph-node's _change_block filter matches entities written at or after
+    # a block, which is how mutable entities are synced incrementally
+    changed_var = ', $changed_block: Int!' if changed else ''
+    changed_filter = '_change_block: { number_gte: $changed_block }' if changed else ''
+    return gql(f"""
+        query(
+            $last_id: ID!, $first: Int!{upper_var}{changed_var}
+        ) {{
+        {graphql_entity}(
+            where: {{
+                id_gt: $last_id
+                {upper_filter}
+                {changed_filter}
+            }}
+            orderBy: id
+            orderDirection: asc
+            first: $first
+        ) {{
+            {query_fields}
+        }}
+        }}
+    """)
+
+
+async def run_shard_query(session, query, params, accessor, shard, semaphore, queue):
+    async with semaphore:
+        while True:
+            result = await session.execute(query, variable_values=params)
+            page = result[accessor]
+            if len(page) > 0:
+                await queue.put((shard, page))
+                params['last_id'] = page[-1]['id']
+            if len(page) < params['first']:
+                break
+
+
+async def run_backfill_query(session, graphql_entity, query_fields, shards, concurrency, changed_block=None):
+    semaphore = asyncio.Semaphore(concurrency)
+    # A bounded queue applies backpressure so shards never run ahead
+    # of the database writes
+    queue = asyncio.Queue(maxsize=concurrency)
+    tasks = []
+    for lower, upper, last_id in shards:
+        params = {'last_id': last_id, 'first': MAX_PAGE_SIZE}
+        if upper is not None:
+            params['upper_id'] = upper
+        if changed_block is not None:
+            params['changed_block'] = changed_block
+        query = get_backfill_query(
+            graphql_entity, query_fields, bounded=upper is not None, changed=changed_block is not None)
+        tasks.append(run_shard_query(
+            session, query, params, graphql_entity, lower, semaphore, queue))
+
+    async def fetch_all():
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await queue.put(None)
+
+    # Pages arrive interleaved across shards, but every id belongs to
+    # exactly one shard so the table ends up identical to a serial run
+    producer = asyncio.ensure_future(fetch_all())
+    try:
+        while True:
+            item = await queue.get()
+            METRICS.set_queue_depth(graphql_entity, queue.qsize())
+            if item is None:
+                break
+            yield item
+        await producer
+    finally:
+        producer.cancel()
+
+
+def insert_batch(conn, table_name, columns, rows, graphql_types, scales):
+    start = time.monotonic()
+    events = decode_pages([rows], graphql_types, scales)[columns].drop_duplicates()
+    METRICS.observe('clean', table_name, time.monotonic() - start, rows=len(rows))
+
+    print(f'INSERTING {events.shape[0]} ROWS INTO {table_name}')
+    start = time.monotonic()
+    insert_rows(conn, table_name, columns, events.itertuples(index=False, name=None))
+    METRICS.observe('insert', table_name, time.monotonic() - start, rows=events.shape[0])
+    return events.shape[0]
+
+
+def write_batch(conn, table_name, columns, rows, graphql_types, scales, checkpoint_table=None, cursors=None,
+                stored_days=None):
+    """Insert a batch and, for backfills, the shard cursors it reached in one transaction.
+
+    When `stored_days` is given, the days of the stored rows the batch
+    replaces are added to it first.
+    """
+    if stored_days is not None:
+        stored_days.update(get_stored_days(conn, table_name, [row['id'] for row in rows]))
+    num_rows = insert_batch(conn, table_name, columns, rows, graphql_types, scales)
+    if checkpoint_table is not None:
+        save_backfill_cursors(conn, checkpoint_table, cursors)
+    conn.commit()
+    return num_rows
+
+
+async def insert_pages(db, table_name, columns, pages, graphql_types, scales, batch_size,
+                       checkpoint_table=None, days=None, mutable=False):
+    """Clean and insert (shard, page) pairs as they arrive, one bounded batch per transaction.
+
+    When `checkpoint_table` is given the last id of every shard in the batch is
+    saved with it, so backfill cursors never run ahead of the data. When `days`
+    is given the day of every row is added to it, and for `mutable` entities
+    also the day each updated row had before.
+    """
+    # Rows of other entities are never updated, so can't leave a day
+    stored_days = days if mutable else None
+    total_rows = 0
+    batch = []
+    cursors = {}
+    async for shard, page in pages:
+        batch.extend(page)
+        cursors[shard] = page[-1]['id']
+        if days is not None:
+            days.update(get_day(row['timestamp']) for row in page)
+        if len(batch) >= batch_size:
+            total_rows += await db.run(
+                write_batch, table_name, columns, batch, graphql_types, scales, checkpoint_table, cursors,
+                stored_days)
+            batch = []
+            cursors = {}
+    if len(batch) > 0:
+        total_rows += await db.run(
+            write_batch, table_name, columns, batch, graphql_types, scales, checkpoint_table, cursors,
+            stored_days)
+    return total_rows
+
+
+def writes_parquet(config, args):
+    # Parquet partitions are by day, so entities without a timestamp are skipped
+    return args.parquet_dir is not None and 'timestamp' in config['fields']
+
+
+def is_refreshed_by_timestamp(config, args):
+    # Mutable entities are synced by change block instead
+    return args.backfill != True and not config.get('mutable', False)
+
+
+async def sync_entity(config, session, db, refresh_batch, args):
     table_name = config['table_name']
     graphql_entity = config['graphql_entity']
     fields = config['fields']
-    url = config['graphql_url']
     graphql_types = config['graphql_types']
     graphql_query_fields = list(graphql_types.keys())
-
-    # Connect to your SQLite database
-    conn = sqlite3.connect(config['database_file'])
-    cursor = conn.cursor()
+    # Decimal fields stored as integers with this many decimals
+    scales = config.get('decimal_scales', {})
+    indexes = config.get('indexes', [])
 
     # Define your GraphQL query
     query_fields = ', '.join(graphql_query_fields)
 
-    # Set up tables if this is a backfill
-    if(args.backfill == True):
-        # Call the create_table function to drop and re-create the table
-        print(f"DROPPING TABLE {table_name}")
-        create_table(cursor, table_name, fields)
-        query = gql(f"""
-            query(
-                $last_id: ID!
-            ) {{
-            {graphql_entity}(
-                where: {{
-                    id_gt: $last_id
-                }}
-                first: 1000
-            ) {{
-                {query_fields}
-            }}
-            }}
-        """)
+    await db.run(create_sync_state)
+
+    # Mutable entities are synced by change block, starting from a backfill
+    mutable = config.get('mutable', False)
+    watermark = await db.run(get_watermark, table_name) if mutable else None
+    if mutable and watermark is None and args.backfill != True:
+        print(f"NO WATERMARK FOR {table_name}, BACKFILLING")
 
-        params = {'last_id': ''}
+    # Backfills write into a shadow table that replaces the live one at the end
+    if(args.backfill == True or (mutable and watermark is None)):
+        shards = await db.run(get_backfill_shards, table_name)
+        if len(shards) > 0:
+            print(f"RESUMING BACKFILL OF {table_name} ({len(shards)} SHARDS)")
+        else:
+            print(f"STARTING BACKFILL OF {table_name} ({args.shards} SHARDS)")
+            start_block = await get_head_block(session)
+            shards = await db.run(start_backfill, table_name, fields, args.shards, start_block)
 
         # Fetch data from the GraphQL API
-        response = await run_backfill_query(query, params, graphql_entity, url=url)
-        events = clean_df(response, graphql_types).drop_duplicates()
+        pages = run_backfill_query(
+            session, graphql_entity, query_fields, shards, args.concurrency)
+        total_rows = await insert_pages(
+            db, get_shadow_table(table_name), graphql_query_fields, pages, graphql_types,
+            scales, args.batch_size, checkpoint_table=table_name)
 
-    else:
-        last_ts = get_last_ts(conn, table_name)
-        query = gql(f"""
-            query(
-                $last_ts: BigInt!
-            ) {{
-            {graphql_entity}(
-                where: {{
-                    timestamp_gte: $last_ts
-                }}
-                orderBy: timestamp
-                orderDirection: asc
-                first: 1000
-            ) {{
-                {query_fields}
-            }}
-            }}
-        """)
-        params = {'last_ts': f'{last_ts}'}
+        print(f"SWAPPING IN TABLE {table_name}")
+        await db.run(swap_backfill_table, table_name, scales, indexes)
 
-        # Fetch data from the GraphQL API
-        response = await run_refresh_query(query, params, graphql_entity, url=url)
-        events = clean_df(response, graphql_types).drop_duplicates()
+        if writes_parquet(config, args):
+            print(f"REBUILDING PARQUET DATASET OF {table_name}")
+            await db.run(write_partitions, table_name, args.parquet_dir)
 
-    # Prepare the data for insertion
-    data_to_insert = [tuple(event[1].values) for event in events.iterrows()]
-    print(f'INSERTING {events.shape[0]} ROWS')
+    else:
+        stored_scales = await db.run(get_column_scales, table_name)
+        if stored_scales != scales:
+            raise ValueError(
+                f"{table_name} is stored with decimal scales {stored_scales} but configured with {scales}, backfill it to convert")
+        await db.run(sync_indexes, table_name, indexes)
+        # The days that receive rows are tracked to rewrite only their
+        # partitions, unless there is no dataset yet to update
+        parquet = writes_parquet(config, args)
+        days = set() if parquet and has_dataset(args.parquet_dir, table_name) else None
+
+        if mutable:
+            # Upsert every row written since the watermark. Rows changed while
+            # this runs are fetched again next time, which is harmless.
+            print(f"SYNCING {table_name} CHANGES SINCE BLOCK {watermark}")
+            head_block = await get_head_block(session)
+            pages = run_backfill_query(
+                session, graphql_entity, query_fields, [('', None, '')], args.concurrency,
+                changed_block=watermark)
+            total_rows = await insert_pages(
+                db, table_name, graphql_query_fields, pages, graphql_types, scales, args.batch_size,
+                days=days, mutable=True)
+            await db.run(save_watermark, table_name, head_block)
+
+        else:
+            last_ts, last_id = await db.run(get_last_cursor, table_name)
+            params = {'last_ts': f'{last_ts}', 'last_id': last_id}
+
+            # Fetch data from the GraphQL API, batched with the other entities
+            # on the same endpoint
+            pages = refresh_batch.pages(graphql_entity, query_fields, params)
+            total_rows = await insert_pages(
+                db, table_name, graphql_query_fields, pages, graphql_types, scales, args.batch_size,
+                days=days)
+
+        if parquet and days is None:
+            print(f"REBUILDING MISSING PARQUET DATASET OF {table_name}")
+            await db.run(write_partitions, table_name, args.parquet_dir)
+        elif days:
+            # Only the days that received rows are rewritten
+            print(f"WRITING {len(days)} PARQUET PARTITIONS OF {table_name}")
+            await db.run(write_partitions, table_name, args.parquet_dir, days)
+
+    print(f'INSERTED {total_rows} ROWS INTO {table_name}')
 
-    # Insert the data into the SQLite database using executemany
-    placeholders = ', '.join(['?' for _ in graphql_query_fields])
-    cursor.executemany(
-        f"INSERT OR REPLACE INTO {table_name} ({', '.join(graphql_query_fields)}) VALUES ({placeholders})", data_to_insert)
 
-    # Commit the changes and close the connection
-    conn.commit()
-    conn.close()
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Export data from a GraphQL API to an SQLite database")
+    parser.add_argument('-c', '--config', required=True, nargs='+',
+                        help="Paths to JSON configuration files, or directories of them")
+    parser.add_argument('-b', '--backfill', required=False, type=bool,
+                        help="Rebuild the tables from the beginning, resuming an interrupted backfill if there is one")
+    parser.add_argument('-s', '--shards', required=False, type=int, default=1,
+                        help="Number of id ranges to fetch in parallel during a backfill")
+    parser.add_argument('--concurrency', required=False, type=int, default=4,
+                        help="Maximum number of id ranges fetched at the same time per entity")
+    parser.add_argument('--max-requests', required=False, type=int, default=8,
+                        help="Maximum number of requests in flight per endpoint")
+    parser.add_argument('--batch-size', required=False, type=int, default=10000,
+                        help="Number of rows to clean and insert per transaction")
+    parser.add_argument('--parquet-dir', required=False,
+                        help="Also write every synced table to a Parquet dataset partitioned by day in this directory")
+    parser.add_argument('--metrics-file', required=False, default=os.getenv('METRICS_FILE'),
+                        help="Record stage metrics to this Prometheus textfile (.prom) or JSON lines file")
+    args = parser.parse_args()
+
+    configs = read_configs(args.config)
+
+    async with AsyncExitStack() as stack:
+        stack.enter_context(METRICS.run('export_to_sqlite', args.metrics_file))
+
+        # One session per endpoint, so every entity on it shares the schema
+        # and the pooled HTTP connections
+        sessions = {}
+        for url in sorted(set(config['graphql_url'] for config in configs)):
+            mirrors = sorted(set(
+                mirror for config in configs if config['graphql_url'] == url
+                for mirror in config.get('graphql_mirrors', [])))
+            sessions[url] = await stack.enter_async_context(
+                open_session(url, max_concurrency=args.max_requests, mirrors=mirrors))
+
+        # One connection per database, shared by every entity written to it
+        databases = {}
+        for database_file in set(config['database_file'] for config in configs):
+            databases[database_file] = Database(database_file, bulk_load=args.backfill == True)
+            stack.callback(databases[database_file].close)
+
+        # Entities refreshed by timestamp share one query per request on
+        # each endpoint
+        refresh_batches = {}
+        for url, session in sessions.items():
+            size = len([
+                config for config in configs
+                if config['graphql_url'] == url and is_refreshed_by_timestamp(config, args)])
+            refresh_batches[url] = RefreshBatch(session, size)
+
+        await asyncio.gather(*[
+            sync_entity(
+                config, sessions[config['graphql_url']], databases[config['database_file']],
+                refresh_batches[config['graphql_url']], args)
+            for config in configs
+        ])
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,11 +1,17 @@
 import os
+import time
 import asyncio
 import json
-import sqlite3
 import argparse
 import pandas as pd
 import nest_asyncio
+from collections import deque
+from utils.blocks import BlockIndex, BlockResolver, get_missing_blocks
+from utils.contracts import get_deployed_contract
 from utils.data import clean_df
+from utils.db import connect, close, insert_rows, sync_indexes
+from utils.metrics import METRICS
+from utils.rpc import open_rpc
 from copy import deepcopy
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
@@ -22,10 +28,11 @@ def read_config(config_file):
         return json.load(file)
 
 
-def create_table(cursor, table_name, fields):
+def create_table(cursor, table_name, fields, drop=False):
     fields_sql = ', '.join([f"{key} {value}" for key, value in fields.items()])
-    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-    cursor.execute(f"CREATE TABLE {table_name} ({fields_sql})")
+    if drop:
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({fields_sql})")
 
 
 def get_last_block(conn, table_name):
@@ -37,22 +44,33 @@ def get_last_block(conn, table_name):
         last_block = df_last_block['block'][0]
     return int(last_block)
 
-def get_market_debt(w3, block_number):
-    # data contract
-    with open('./src/abi/PerpsV2Data.json', 'r') as file:
-        PerpsV2DataAbi = json.dumps(json.load(file))
+def seed_blocks(conn, table_name, blocks):
+    """Add the blocks of earlier samples to an empty block index"""
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    if len(blocks) == 0 and cursor.fetchone() is not None:
+        cursor = conn.execute(f"SELECT block, MIN(timestamp) FROM {table_name} GROUP BY block")
+        print(f'ADDED {blocks.add(cursor.fetchall())} BLOCKS FROM {table_name}')
 
-    PerpsV2DataAddress = "0xF7D3D05cCeEEcC9d77864Da3DdE67Ce9a0215A9D"
-    perpsV2Data = w3.eth.contract(address=PerpsV2DataAddress, abi=PerpsV2DataAbi)
 
-    # get the block
-    block = w3.eth.get_block(block_number)
+async def get_market_debt(w3, rpc, blocks, block_number):
+    # data contract, compiled once per process
+    perpsV2Data = get_deployed_contract('optimism', 'PerpsV2Data')
+    allProxiedMarketSummaries = perpsV2Data.functions['allProxiedMarketSummaries']
+
+    # get the block timestamp, from the index if it has been seen before or
+    # in the same batch as the call
+    timestamp = blocks.get_timestamp(block_number)
+    block = asyncio.ensure_future(rpc.get_block(block_number)) if timestamp is None else None
 
     try:
-        marketSummaries = perpsV2Data.functions.allProxiedMarketSummaries().call(
-            block_identifier=block_number)
-    except:
+        output = await rpc.call(perpsV2Data.address, allProxiedMarketSummaries.encode(), block_number)
+        marketSummaries = allProxiedMarketSummaries.decode(output, normalize=False)
+    except Exception:
         marketSummaries = []
+    if block is not None:
+        timestamp = (await block)['timestamp']
+        blocks.add([(block_number, timestamp)])
 
     markets = [{
         'asset': market[1].decode().replace('\x00', ''),
@@ -63,8 +81,8 @@ def get_market_debt(w3, block_number):
         df_markets = pd.DataFrame(markets)
         df_markets['marketDebt'] = df_markets['marketDebt'].astype(float)
         df_markets = df_markets.set_index('asset').transpose()
-        df_markets['block'] = block['number']
-        df_markets['timestamp'] = block['timestamp']
+        df_markets['block'] = block_number
+        df_markets['timestamp'] = timestamp
         df_markets = df_markets.melt(id_vars=['block', 'timestamp'],
                 var_name='asset', value_name='market_debt')
 
@@ -72,6 +90,47 @@ def get_market_debt(w3, block_number):
     else:
         return None
 
+
+async def get_interval_blocks(blocks, from_block, to_block, interval, batch_size):
+    """Return the first block at or after every multiple of `interval` seconds between two blocks"""
+    async with open_rpc(RPC_ENDPOINT, max_batch_size=batch_size) as rpc:
+        resolver = BlockResolver(rpc, blocks)
+        start = await resolver.get_timestamp(from_block)
+        end = await resolver.get_timestamp(to_block)
+        timestamps = range(-(-start // interval) * interval, end + 1, interval)
+        resolved = await resolver.resolve_all(timestamps)
+        print(f'RESOLVED {len(timestamps)} TIMESTAMPS WITH {resolver.num_requests} REQUESTS')
+    return sorted(set(block for block in resolved if block is not None))
+
+
+async def fetch_market_debts(w3, rpc, blocks, check_blocks, concurrency):
+    """Fetch the market debt of many blocks at once, yielding them in block order.
+
+    At most `concurrency` blocks are in flight, and their requests are sent
+    together as JSON-RPC batches. A slow block holds back the ones after it
+    rather than letting them pile up in memory.
+    """
+    async def fetch(block):
+        start = time.monotonic()
+        df_block = await get_market_debt(w3, rpc, blocks, block)
+        METRICS.observe(
+            'sample', 'market_debt', time.monotonic() - start,
+            rows=df_block.shape[0] if df_block is not None else 0)
+        return block, df_block
+
+    pending = deque()
+    try:
+        for block in check_blocks:
+            pending.append(asyncio.ensure_future(fetch(block)))
+            if len(pending) >= concurrency:
+                yield await pending.popleft()
+        while len(pending) > 0:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
 async def main():
     parser = argparse.ArgumentParser(
         description="Export marketDebt data from each market across blocks")
@@ -81,12 +140,29 @@ async def main():
                         help="First block to check")
     parser.add_argument('-t', '--to-block', required=False, type=int,
                         help="Last block to check")
-    parser.add_argument('-i', '--increment', required=True, type=int,
+    parser.add_argument('-i', '--increment', required=False, type=int,
                         help="Amount of blocks to increment per step")
+    parser.add_argument('--interval', required=False, type=int,
+                        help="Sample the first block of every multiple of this many seconds instead, e.g. 3600 for hourly")
     parser.add_argument('-b', '--backfill', required=False, type=bool,
-                        help="Remove the table and backfill from the beginning")
+                        help="Fill every sample missing from the range, keeping the ones already stored")
+    parser.add_argument('--drop', required=False, type=bool,
+                        help="Remove the table first, so every sample is fetched again")
+    parser.add_argument('--concurrency', required=False, type=int, default=32,
+                        help="Number of blocks fetched at once")
+    parser.add_argument('--batch-size', required=False, type=int, default=100,
+                        help="Most JSON-RPC requests sent in one batch")
+    parser.add_argument('--metrics-file', required=False, default=os.getenv('METRICS_FILE'),
+                        help="Record stage metrics to this Prometheus textfile (.prom) or JSON lines file")
     args = parser.parse_args()
+    if args.increment is None and args.interval is None:
+        parser.error("one of --increment or --interval is required")
+
+    with METRICS.run('market_debt', args.metrics_file):
+        await sync_market_debt(args)
 
+
+async def sync_market_debt(args):
     # Read config
     config = read_config(args.config)
     table_name = config['table_name']
@@ -98,9 +174,13 @@ async def main():
     w3.middleware_onion.inject(geth_poa_middleware, layer=0)
 
     # Connect to your SQLite database
-    conn = sqlite3.connect(config['database_file'])
+    conn = connect(config['database_file'], bulk_load=args.backfill == True)
     cursor = conn.cursor()
 
+    # Timestamps of every block seen, so no block is fetched twice
+    blocks = BlockIndex(conn, 'optimism')
+    seed_blocks(conn, config['table_name'], blocks)
+
     # Parse arguments
     print(f"ARGS {args}")
     from_block = args.from_block
@@ -117,45 +197,45 @@ async def main():
     
     print('ARGS: ', from_block, to_block, increment)
 
-    # Set up tables if this is a backfill
-    if(args.backfill == True):
-        # Call the create_table function to drop and re-create the table
+    # Set up the table, dropping the stored samples only when asked to
+    if(args.drop == True):
         print(f"DROPPING TABLE {table_name}")
-        create_table(cursor, table_name, fields)
-
-    # Get the existing data
-    df = pd.read_sql_query(f"SELECT block FROM {table_name}", conn)
-
-    # Loop through queries and insert data
-    num_incs = int((to_block - from_block) / increment)
-    print(f'RUNNING {num_incs} TIMES')
-    for inc in range(num_incs):
-        check_block = from_block + inc * increment
-        if check_block in df['block'].unique():
-            print(f'SKIPPING BLOCK {check_block}')
-            continue
-    
-        print(f'CHECKING BLOCK {check_block}')
-        df_block = get_market_debt(w3, check_block)
-        if df_block is not None:
-            df_block['id'] = df_block.apply(lambda x: f"{str(x['block'])}-{x['asset']}", axis=1)
-            df_block = df_block[field_names]
-
-            # Prepare the data for insertion
-            data_to_insert = [tuple(event[1].values) for event in df_block.iterrows()]
-            print(f'INSERTING {df_block.shape[0]} ROWS')
-
-            # Insert the data into the SQLite database using executemany
-            placeholders = ', '.join(['?' for _ in field_names])
-            cursor.executemany(
-                f"INSERT OR REPLACE INTO {table_name} ({', '.join(field_names)}) VALUES ({placeholders})", data_to_insert)
-        else:
-            print(f"CALL FAILED AT BLOCK {check_block}")
-        
-
-    # Commit the changes and close the connection
+    create_table(cursor, table_name, fields, drop=args.drop == True)
+
+    # Plan the samples in the range that aren't stored yet
+    if args.interval is None:
+        num_incs = int((to_block - from_block) / increment)
+        sample_blocks = range(from_block, from_block + num_incs * increment, increment)
+    else:
+        sample_blocks = await get_interval_blocks(blocks, from_block, to_block, args.interval, args.batch_size)
+    check_blocks = get_missing_blocks(conn, table_name, sample_blocks)
+    print(f'SKIPPING {len(sample_blocks) - len(check_blocks)} BLOCKS ALREADY STORED')
+    print(f'RUNNING {len(check_blocks)} TIMES')
+
+    def get_check_blocks():
+        for check_block in check_blocks:
+            print(f'CHECKING BLOCK {check_block}')
+            yield check_block
+
+    async with open_rpc(RPC_ENDPOINT, max_batch_size=args.batch_size) as rpc:
+        async for check_block, df_block in fetch_market_debts(w3, rpc, blocks, get_check_blocks(), args.concurrency):
+            if df_block is not None:
+                df_block['id'] = df_block.apply(lambda x: f"{str(x['block'])}-{x['asset']}", axis=1)
+                df_block = df_block[field_names]
+
+                # Insert the data into the SQLite database, one transaction per block
+                print(f'INSERTING {df_block.shape[0]} ROWS')
+                start = time.monotonic()
+                insert_rows(conn, table_name, field_names, df_block.itertuples(index=False, name=None))
+                conn.commit()
+                METRICS.observe('insert', table_name, time.monotonic() - start, rows=df_block.shape[0])
+            else:
+                print(f"CALL FAILED AT BLOCK {check_block}")
+
+    # Build any missing indexes after loading rather than during it
+    sync_indexes(conn, table_name, config.get('indexes', []))
     conn.commit()
-    conn.close()
+    close(conn)
 
 if __name__ == '__main__':
     asyncio.run(main())
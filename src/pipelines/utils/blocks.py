@@ -0,0 +1,190 @@
+import asyncio
+import json
+from bisect import bisect_left, bisect_right
+
+
+def create_blocks_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blocks (
+            chain TEXT,
+            number INTEGER,
+            timestamp INTEGER,
+            PRIMARY KEY (chain, number)
+        ) WITHOUT ROWID
+    """)
+
+
+def get_missing_blocks(conn, table_name, sample_blocks):
+    """Return the sample blocks with no rows in the table yet, in one query.
+
+    `sample_blocks` is a range, generated in SQL, or a sorted list of blocks.
+    Blocks whose call failed on an earlier run have no rows, so they are
+    returned again.
+    """
+    if isinstance(sample_blocks, range):
+        samples = f"""
+            WITH RECURSIVE samples(block) AS (
+                SELECT {sample_blocks.start} WHERE {sample_blocks.start} < {sample_blocks.stop}
+                UNION ALL
+                SELECT block + {sample_blocks.step} FROM samples WHERE block + {sample_blocks.step} < {sample_blocks.stop}
+            )
+        """
+        params = ()
+    else:
+        samples = "WITH samples(block) AS (SELECT value FROM json_each(?))"
+        params = (json.dumps(sample_blocks),)
+    cursor = conn.execute(f"""
+        {samples}
+        SELECT block FROM samples
+        WHERE NOT EXISTS (SELECT 1 FROM {table_name} WHERE {table_name}.block = samples.block)
+        ORDER BY block
+    """, params)
+    return [block for (block,) in cursor.fetchall()]
+
+
+class BlockIndex:
+    """Block numbers and timestamps of a chain seen so far, stored in the `blocks` table.
+
+    The blocks are also kept in memory sorted by number. Timestamps never
+    decrease with the block number, so the same order answers lookups by
+    timestamp. Blocks are written with the caller's next commit.
+    """
+
+    def __init__(self, conn, chain):
+        self.conn = conn
+        self.chain = chain
+        create_blocks_table(conn)
+        cursor = conn.execute(
+            "SELECT number, timestamp FROM blocks WHERE chain = ? ORDER BY number", (chain,))
+        rows = cursor.fetchall()
+        self.numbers = [number for number, _ in rows]
+        self.timestamps = [timestamp for _, timestamp in rows]
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def get_timestamp(self, number):
+        """Return the timestamp of a block, or None if it hasn't been seen"""
+        i = bisect_left(self.numbers, number)
+        if i < len(self.numbers) and self.numbers[i] == number:
+            return self.timestamps[i]
+        return None
+
+    def get_neighbors(self, timestamp):
+        """Return the last known block before a timestamp and the first at or after it, as (number, timestamp) or None"""
+        i = bisect_left(self.timestamps, timestamp)
+        before = (self.numbers[i - 1], self.timestamps[i - 1]) if i > 0 else None
+        after = (self.numbers[i], self.timestamps[i]) if i < len(self.numbers) else None
+        return before, after
+
+    def get_block_at(self, timestamp):
+        """Return the last known block at or before a timestamp, or None"""
+        i = bisect_right(self.timestamps, timestamp)
+        return self.numbers[i - 1] if i > 0 else None
+
+    def add(self, blocks):
+        """Record (number, timestamp) pairs, skipping blocks already known"""
+        new = []
+        for number, timestamp in blocks:
+            i = bisect_left(self.numbers, number)
+            if i < len(self.numbers) and self.numbers[i] == number:
+                continue
+            self.numbers.insert(i, number)
+            self.timestamps.insert(i, timestamp)
+            new.append((self.chain, number, timestamp))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO blocks (chain, number, timestamp) VALUES (?, ?, ?)", new)
+        return len(new)
+
+
+class BlockResolver:
+    """Finds the first block at or after a timestamp with interpolation search.
+
+    The search starts from the nearest blocks known to the index on either
+    side, and from the chain's first block and head. It guesses the block by
+    assuming a constant block time between them. On Optimism, where block
+    times barely change, a timestamp usually resolves in one or two requests.
+    The search falls back to bisection when a guess doesn't halve the range.
+    Every block fetched is added to the index, so a timestamp resolved once is
+    answered from memory afterwards.
+    """
+
+    def __init__(self, rpc, index, first_block=1):
+        self.rpc = rpc
+        self.index = index
+        self.first_block = first_block
+        self.requests = {}
+        self.head = None
+        self.num_requests = 0
+
+    async def get_timestamp(self, number):
+        timestamp = self.index.get_timestamp(number)
+        if timestamp is not None:
+            return timestamp
+        # Concurrent searches share requests for the same block
+        if number not in self.requests:
+            self.requests[number] = asyncio.ensure_future(self.rpc.get_block(number))
+            self.num_requests += 1
+        try:
+            block = await self.requests[number]
+        finally:
+            self.requests.pop(number, None)
+        self.index.add([(number, block['timestamp'])])
+        return block['timestamp']
+
+    async def get_head(self):
+        if self.head is None:
+            self.head = asyncio.ensure_future(self.rpc.get_block('latest'))
+            self.num_requests += 1
+        block = await self.head
+        self.index.add([(block['number'], block['timestamp'])])
+        return block['number'], block['timestamp']
+
+    async def resolve(self, timestamp):
+        """Return the first block at or after a timestamp, or None if the chain hasn't reached it"""
+        before, after = self.index.get_neighbors(timestamp)
+        if after is None:
+            after = await self.get_head()
+            if after[1] < timestamp:
+                return None
+        if before is None:
+            before = (self.first_block, await self.get_timestamp(self.first_block))
+            if before[1] >= timestamp:
+                return self.first_block
+
+        (low, low_timestamp), (high, high_timestamp) = before, after
+        bisect = False
+        while high - low > 1:
+            if bisect:
+                guess = (low + high) // 2
+            else:
+                guess = low + (timestamp - low_timestamp) * (high - low) // max(1, high_timestamp - low_timestamp)
+            guess = min(max(guess, low + 1), high - 1)
+
+            guess_timestamp = await self.get_timestamp(guess)
+            width = high - low
+            if guess_timestamp < timestamp:
+                low, low_timestamp = guess, guess_timestamp
+            else:
+                high, high_timestamp = guess, guess_timestamp
+            bisect = high - low > width // 2
+        return high
+
+    async def resolve_all(self, timestamps):
+        """Resolve many timestamps, sharing JSON-RPC batches between concurrent searches.
+
+        Timestamps are resolved in rounds of increasing density, e.g. every
+        64th first, so later searches start from the blocks found by earlier
+        rounds and mostly need a request or two.
+        """
+        timestamps = list(timestamps)
+        resolved = {}
+        step = 1
+        while step * 4 < len(timestamps):
+            step *= 4
+        while step >= 1:
+            todo = [timestamp for timestamp in timestamps[::step] if timestamp not in resolved]
+            for timestamp, block in zip(todo, await asyncio.gather(*[self.resolve(t) for t in todo])):
+                resolved[timestamp] = block
+            step //= 4
+        return [resolved[timestamp] for timestamp in timestamps]
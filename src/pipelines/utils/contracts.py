@@ -0,0 +1,118 @@
+import os
+import json
+from functools import lru_cache
+from eth_abi.registry import registry
+from eth_abi.encoding import TupleEncoder
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+
+ABI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'abi')
+
+# Deployed contracts by chain, each with an ABI of the same name in src/abi
+CONTRACTS = {
+    'optimism': {
+        'PerpsV2Data': '0xF7D3D05cCeEEcC9d77864Da3DdE67Ce9a0215A9D',
+        'PerpsV2MarketData': '0x58e6227510F83d3F45B339F2f7A05a699fDEE6D4',
+        'PerpsV2MarketSettings': '0x649F44CAC3276557D03223Dbf6395Af65b11c11c',
+    },
+}
+
+contract_cache = {}
+
+
+@lru_cache(maxsize=None)
+def load_abi(name):
+    with open(os.path.join(ABI_DIR, f"{name}.json"), 'r') as file:
+        return json.load(file)
+
+
+def get_abi_type(param):
+    # Tuples are written out as their component types, e.g. `(address,uint256)[]`
+    if param['type'].startswith('tuple'):
+        components = ','.join(get_abi_type(component) for component in param['components'])
+        return f"({components}){param['type'][len('tuple'):]}"
+    return param['type']
+
+
+def get_normalizer(param):
+    """Return a function checksumming the addresses in a decoded value like web3 does, or None if it has none"""
+    if param['type'].endswith(']'):
+        normalize = get_normalizer({**param, 'type': param['type'][:param['type'].rindex('[')]})
+        if normalize is None:
+            return None
+        return lambda values: tuple(normalize(value) for value in values)
+    if param['type'] == 'tuple':
+        normalizers = [get_normalizer(component) for component in param['components']]
+        if all(normalize is None for normalize in normalizers):
+            return None
+        return lambda values: tuple(
+            value if normalize is None else normalize(value) for normalize, value in zip(normalizers, values))
+    if param['type'] == 'address':
+        return to_checksum_address
+    return None
+
+
+class ContractFunction:
+    """The selector, argument encoder and output decoder of a contract function, built once from its ABI"""
+
+    def __init__(self, abi):
+        self.abi = abi
+        self.name = abi['name']
+        self.input_names = [param['name'] for param in abi['inputs']]
+        self.input_types = [get_abi_type(param) for param in abi['inputs']]
+        self.output_types = [get_abi_type(param) for param in abi['outputs']]
+        self.selector = function_signature_to_4byte_selector(f"{self.name}({','.join(self.input_types)})")
+        self.encoder = TupleEncoder(encoders=[registry.get_encoder(abi_type) for abi_type in self.input_types])
+        self.decoder = TupleDecoder(decoders=[registry.get_decoder(abi_type) for abi_type in self.output_types])
+        self.normalizers = [get_normalizer(param) for param in abi['outputs']]
+
+    def encode(self, *args, **kwargs):
+        """Return the call data for the arguments, given in order or by name, as hex"""
+        args = args + tuple(kwargs[name] for name in self.input_names[len(args):])
+        return '0x' + (self.selector + self.encoder(args)).hex()
+
+    def decode(self, data, normalize=True):
+        """Decode the output of a call, unwrapping a single output like web3's `.call()`.
+
+        Addresses are checksummed unless `normalize` is False, which skips
+        hashing every address for callers that don't read them.
+        """
+        values = self.decoder(ContextFramesBytesIO(bytes(data)))
+        if normalize:
+            values = tuple(
+                value if normalizer is None else normalizer(value)
+                for normalizer, value in zip(self.normalizers, values))
+        return values[0] if len(values) == 1 else values
+
+
+class Contract:
+    """A deployed contract with the functions of its ABI compiled"""
+
+    def __init__(self, address, abi):
+        self.address = to_checksum_address(address)
+        self.abi = abi
+        self.abi_map = {entry['name']: entry for entry in abi if entry['type'] == 'function'}
+        self.functions = {name: ContractFunction(entry) for name, entry in self.abi_map.items()}
+
+    def call(self, w3, function_name, *args, block_identifier='latest', **kwargs):
+        """Call a function through a web3 provider without building a web3 contract"""
+        function = self.functions[function_name]
+        output = w3.eth.call(
+            {'to': self.address, 'data': function.encode(*args, **kwargs)}, block_identifier)
+        return function.decode(output)
+
+
+def get_contract(chain, address, abi):
+    """Return the contract at an address, built once per process.
+
+    `abi` is either the ABI itself or the name of an ABI file in src/abi.
+    """
+    key = (chain, address.lower())
+    if key not in contract_cache:
+        contract_cache[key] = Contract(address, load_abi(abi) if isinstance(abi, str) else abi)
+    return contract_cache[key]
+
+
+def get_deployed_contract(chain, name):
+    """Return one of the contracts listed in CONTRACTS by name"""
+    return get_contract(chain, CONTRACTS[chain][name], name)
@@ -1,4 +1,20 @@
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, localcontext
+import numpy as np
+import pandas as pd
+
+DECIMALS = 18
+
+# Values with more digits than this don't fit the two int64 halves of
+# parseDecimals and fall back to Decimal
+MAX_VECTOR_DIGITS = 2 * DECIMALS
+
+# Only plain integers are parsed as digits, anything else falls back to Decimal
+INTEGER_PATTERN = r'-?[0-9]+'
+
+INT64_MIN, INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+# One extra power covers the sign column of negative values
+POWERS_OF_TEN = 10 ** np.arange(DECIMALS + 1, dtype=np.int64)
 
 
 def convertDecimals(x):
@@ -8,15 +24,210 @@ def convertDecimals(x):
         return x
 
 
+def scaleDecimal(x, scale):
+    """Convert one 1e18 fixed-point value to an int with `scale` decimals, raising ValueError if it isn't a number or doesn't fit in int64"""
+    with localcontext() as context:
+        # Enough precision for any value that could fit
+        context.prec = 2 * MAX_VECTOR_DIGITS
+        try:
+            value = Decimal(x).scaleb(scale - DECIMALS).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError(f"Can't store {x!r} as a decimal with {scale} decimals")
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError(f"Decimal value too large to store with {scale} decimals")
+    return int(value)
+
+
 def convertBytes(x): return bytearray.fromhex(
     x[2:]).decode().replace('\x00', '')
 
 
-def clean_df(df, types):
+def digitMatrix(values):
+    """View fixed-point integer strings as a right-aligned matrix of digits.
+
+    Returns the digits, a mask of negative values and a mask of values to
+    convert one at a time instead, whose rows are left as zeros. Those are
+    values that aren't plain integers, like '1.5', '1e5' or '', and ones with
+    more digits than MAX_VECTOR_DIGITS.
+    """
+    values = np.asarray(values, dtype=object)
+    fallback = ~pd.Series(values, dtype=object).astype(str).str.fullmatch(INTEGER_PATTERN).to_numpy(dtype=bool)
+    chars = np.where(fallback, '0', values).astype('S')
+    negative = np.char.startswith(chars, b'-')
+    fallback |= np.char.str_len(chars) - negative > MAX_VECTOR_DIGITS
+    chars = np.where(fallback, b'0', chars)
+    negative &= ~fallback
+
+    width = max(np.char.str_len(chars).max(), DECIMALS + 1)
+    padded = np.char.zfill(chars.astype(f'S{width}'), width)
+    digits = padded.view(np.uint8).reshape(-1, width) - ord('0')
+    digits[negative, 0] = 0
+    return digits, negative, fallback
+
+
+def parseDecimals(values):
+    """Convert an array of 1e18 fixed-point integer strings to floats without per-value Python objects.
+
+    The integer part and 18 digit fractional part are each summed exactly in
+    int64. Values that can't be parsed that way come back as NaN alongside a
+    mask of which ones they are.
+    """
+    digits, negative, fallback = digitMatrix(values)
+    width = digits.shape[1]
+
+    fraction = digits[:, -DECIMALS:].astype(np.int64) @ POWERS_OF_TEN[:DECIMALS][::-1]
+    integer = digits[:, :-DECIMALS].astype(np.int64) @ POWERS_OF_TEN[:width - DECIMALS][::-1]
+
+    result = integer + fraction / float(10**DECIMALS)
+    result = np.where(negative, -result, result)
+    return np.where(fallback, np.nan, result), fallback
+
+
+def parseScaledDecimals(values, scale):
+    """Convert an array of 1e18 fixed-point integer strings to int64 with `scale` decimals.
+
+    Dropped digits are rounded half away from zero. Raises ValueError if
+    `scale` isn't between 0 and 18, or if a value isn't a number or doesn't
+    fit in int64 at that scale.
+    """
+    if not 0 <= scale <= DECIMALS:
+        raise ValueError(f"Decimal scale must be between 0 and {DECIMALS}, got {scale}")
+    values = np.asarray(values, dtype=object)
+    digits, negative, fallback = digitMatrix(values)
+    width = digits.shape[1]
+    dropped = DECIMALS - scale
+
+    integer = digits[:, :-DECIMALS].astype(np.int64) @ POWERS_OF_TEN[:width - DECIMALS][::-1]
+    kept = digits[:, -DECIMALS:width - dropped].astype(np.int64) @ POWERS_OF_TEN[:scale][::-1]
+    round_up = (digits[:, width - dropped] >= 5 if dropped > 0 else np.zeros(len(digits), dtype=bool)).astype(np.int64)
+
+    # Values whose integer * 10**scale + kept + round_up could pass the int64
+    # bound are checked exactly one at a time, along with the fallbacks
+    fallback |= integer > (INT64_MAX - kept - round_up) // 10**scale
+    integer = np.where(fallback, 0, integer)
+
+    result = integer * 10**scale + kept + round_up
+    result = np.where(negative, -result, result)
+    for i in np.flatnonzero(fallback):
+        result[i] = scaleDecimal(values[i], scale)
+    return result
+
+
+def cleanDecimals(series):
+    values = series.to_numpy(dtype=object)
+    result = np.full(len(values), np.nan)
+
+    notna = series.notna().to_numpy()
+    valid = np.flatnonzero(notna)
+    if len(valid) > 0:
+        parsed, fallback = parseDecimals(values[valid])
+        result[valid] = parsed
+        converted = [convertDecimals(x) for x in values[valid[fallback]]]
+        if any(not isinstance(x, float) for x in converted):
+            # convertDecimals returns values Decimal can't parse unchanged,
+            # so the column stays object like the per-value conversion
+            result = result.astype(object)
+            result[~notna] = values[~notna]
+        result[valid[fallback]] = converted
+
+    return pd.Series(result, index=series.index)
+
+
+def cleanScaledDecimals(series, scale):
+    # Object dtype keeps the values as Python ints, with None for nulls, so
+    # they can be bound straight to SQLite INTEGER columns
+    values = series.to_numpy(dtype=object)
+    result = np.full(len(values), None, dtype=object)
+
+    valid = np.flatnonzero(series.notna().to_numpy())
+    if len(valid) > 0:
+        result[valid] = parseScaledDecimals(values[valid], scale).astype(object)
+
+    return pd.Series(result, index=series.index)
+
+
+def cleanBytes(series):
+    # bytes32 columns like asset and marketKey hold a handful of distinct
+    # values, so each one is decoded once
+    mapping = {x: convertBytes(x) for x in series.dropna().unique()}
+    return series.map(mapping)
+
+
+def clean_df(df, types, scales={}):
     for col in df.columns:
         type = types[col]
-        if type == 'decimal':
-            df[col] = df[col].apply(convertDecimals)
+        if type == 'decimal' and col in scales:
+            df[col] = cleanScaledDecimals(df[col], scales[col])
+        elif type == 'decimal':
+            df[col] = cleanDecimals(df[col])
         elif type == 'bytes':
-            df[col] = df[col].apply(convertBytes)
+            df[col] = cleanBytes(df[col])
     return df
+
+
+# String columns whose values repeat across many rows, stored as categoricals
+CATEGORY_COLUMNS = ['account', 'abstractAccount', 'accountId', 'accountType', 'asset', 'marketKey', 'orderType']
+
+
+def decodeNumbers(values):
+    try:
+        return np.array(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        # Nulls or values too large for int64
+        return pd.to_numeric(pd.Series(values, dtype=object)).to_numpy()
+
+
+def decodeDecimals(values, scale=None):
+    values = np.array(values, dtype=object)
+    if scale is not None and all(x is not None for x in values):
+        return parseScaledDecimals(values, scale)
+    elif scale is not None:
+        return cleanScaledDecimals(pd.Series(values), scale).to_numpy()
+    return cleanDecimals(pd.Series(values)).to_numpy()
+
+
+def decodeBooleans(values):
+    if any(x is None for x in values):
+        # Kept as objects so nulls stay None
+        return np.array(values, dtype=object)
+    return np.array(values, dtype=bool)
+
+
+def decodeCategories(values, decode=None):
+    codes, categories = pd.factorize(np.array(values, dtype=object))
+    if decode is not None:
+        # Each distinct value is decoded once, and two raw values can decode
+        # to the same category
+        remap, categories = pd.factorize(np.array([decode(x) for x in categories], dtype=object))
+        codes = np.where(codes < 0, -1, remap[codes])
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def decode_pages(pages, types, scales={}, categories=CATEGORY_COLUMNS):
+    """Build a typed DataFrame straight from pages of GraphQL rows.
+
+    Numbers become int64, decimals float64 (or int64 with their scale), and
+    bytes and repeated strings like accounts become categoricals, instead of
+    object columns of Python strings.
+    """
+    rows = [row for page in pages for row in page]
+    if len(rows) == 0:
+        return pd.DataFrame()
+
+    data = {}
+    for col in rows[0].keys():
+        type = types[col]
+        values = [row[col] for row in rows]
+        if type == 'number':
+            data[col] = decodeNumbers(values)
+        elif type == 'decimal':
+            data[col] = decodeDecimals(values, scales.get(col))
+        elif type == 'boolean':
+            data[col] = decodeBooleans(values)
+        elif type == 'bytes':
+            data[col] = decodeCategories(values, convertBytes)
+        elif col in categories:
+            data[col] = decodeCategories(values)
+        else:
+            data[col] = np.array(values, dtype=object)
+    return pd.DataFrame(data)
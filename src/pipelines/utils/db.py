@@ -0,0 +1,64 @@
+import sqlite3
+
+# Applied to every connection
+PRAGMAS = [
+    # Only takes effect when the database file is created
+    "PRAGMA page_size = 8192",
+    "PRAGMA temp_store = MEMORY",
+]
+
+# Added for backfills, which write far more pages than a refresh
+BULK_LOAD_PRAGMAS = [
+    # In WAL mode synchronous NORMAL only syncs at checkpoints without
+    # risking corruption. The mode is kept by the file, so close() switches
+    # it back before the database is published.
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    # 256MB page cache and memory mapped reads for the primary key lookups
+    # of INSERT OR REPLACE
+    "PRAGMA cache_size = -262144",
+    "PRAGMA mmap_size = 1073741824",
+    # Checkpoint the WAL less often while loading
+    "PRAGMA wal_autocheckpoint = 10000",
+]
+
+
+def connect(database_file, bulk_load=False, **kwargs):
+    conn = sqlite3.connect(database_file, **kwargs)
+    for pragma in PRAGMAS + (BULK_LOAD_PRAGMAS if bulk_load else []):
+        conn.execute(pragma)
+    return conn
+
+
+def close(conn):
+    """Close a connection, leaving the file in rollback journal mode without -wal or -shm files beside it"""
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+
+
+def insert_rows(conn, table_name, columns, rows):
+    """Insert or replace rows from any iterable of tuples, e.g. `df.itertuples(index=False, name=None)`"""
+    placeholders = ', '.join(['?' for _ in columns])
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def get_index_name(table_name, columns):
+    return f"idx_{table_name}_{'_'.join(columns)}"
+
+
+def sync_indexes(conn, table_name, indexes):
+    """Create the indexes declared for a table and drop ones that are no longer declared.
+
+    `indexes` is a list of column lists, e.g. `[["asset", "timestamp"]]`. List
+    every column a query reads to make the index covering.
+    """
+    declared = {get_index_name(table_name, columns): columns for columns in indexes}
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,))
+    for (name,) in cursor.fetchall():
+        if name.startswith(f"idx_{table_name}_") and name not in declared:
+            conn.execute(f"DROP INDEX {name}")
+
+    for name, columns in declared.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} ({', '.join(columns)})")
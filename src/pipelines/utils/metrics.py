@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, write_to_textfile
+from prometheus_client.parser import text_string_to_metric_families
+
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metrics:
+    """Records the stages of a pipeline run, e.g. every page fetch, clean and insert.
+
+    Paths ending in `.prom` get a Prometheus textfile per job, e.g.
+    `kwenta_data_market_debt.prom`, written when the run ends for
+    node_exporter's textfile collector. Other paths get one JSON line per
+    event as it happens. Until a run is started with a path, recording does
+    nothing.
+    """
+
+    def __init__(self):
+        self.job = None
+        self.registry = None
+        self.file = None
+        self.lock = threading.Lock()
+
+    def configure(self, job, path):
+        self.job = job
+        self.path = path
+        if path is None:
+            return
+        if path.endswith('.prom'):
+            # Jobs sharing a path would replace each other's series
+            self.path = get_job_path(path, job)
+            self.registry = CollectorRegistry()
+            self.stage_seconds = Histogram(
+                'pipeline_stage_seconds', "Wall time of one pipeline stage",
+                ['job', 'stage', 'target'], buckets=STAGE_BUCKETS, registry=self.registry)
+            self.rows = Counter(
+                'pipeline_rows', "Rows handled by a pipeline stage",
+                ['job', 'stage', 'target'], registry=self.registry)
+            self.bytes = Counter(
+                'pipeline_bytes', "Bytes received by a pipeline stage",
+                ['job', 'stage', 'target'], registry=self.registry)
+            self.retries = Counter(
+                'pipeline_retries', "Requests retried after an error",
+                ['job', 'target', 'error'], registry=self.registry)
+            self.queue_depth = Gauge(
+                'pipeline_queue_depth', "Pages waiting to be written",
+                ['job', 'target'], registry=self.registry)
+            self.run_seconds = Gauge(
+                'pipeline_run_seconds', "Wall time of the last run",
+                ['job'], registry=self.registry)
+            self.last_success = Gauge(
+                'pipeline_last_success_timestamp_seconds', "Time the last successful run ended",
+                ['job'], registry=self.registry)
+        else:
+            self.file = open(path, 'a')
+
+    def emit(self, event, **fields):
+        with self.lock:
+            self.file.write(json.dumps({'time': time.time(), 'job': self.job, 'event': event, **fields}) + '\n')
+            self.file.flush()
+
+    def observe(self, stage, target, seconds, rows=None, bytes=None):
+        if self.registry is not None:
+            self.stage_seconds.labels(self.job, stage, target).observe(seconds)
+            if rows is not None:
+                self.rows.labels(self.job, stage, target).inc(rows)
+            if bytes is not None:
+                self.bytes.labels(self.job, stage, target).inc(bytes)
+        elif self.file is not None:
+            self.emit('stage', stage=stage, target=target, seconds=seconds, rows=rows, bytes=bytes)
+
+    def retry(self, target, error):
+        if self.registry is not None:
+            self.retries.labels(self.job, target, error).inc()
+        elif self.file is not None:
+            self.emit('retry', target=target, error=error)
+
+    def set_queue_depth(self, target, depth):
+        if self.registry is not None:
+            self.queue_depth.labels(self.job, target).set(depth)
+        elif self.file is not None:
+            self.emit('queue_depth', target=target, depth=depth)
+
+    @contextmanager
+    def run(self, job, path):
+        """Record a pipeline run, writing the Prometheus textfile when it ends"""
+        self.configure(job, path)
+        start = time.monotonic()
+        success = False
+        try:
+            yield self
+            success = True
+        finally:
+            seconds = time.monotonic() - start
+            if self.registry is not None:
+                self.run_seconds.labels(self.job).set(seconds)
+                if success:
+                    self.last_success.labels(self.job).set_to_current_time()
+                else:
+                    # Keep the time of the last success, so it goes stale
+                    # rather than missing
+                    last_success = read_last_success(self.path, self.job)
+                    if last_success is not None:
+                        self.last_success.labels(self.job).set(last_success)
+                write_to_textfile(self.path, self.registry)
+            elif self.file is not None:
+                self.emit('run', seconds=seconds, success=success)
+                self.file.close()
+            self.registry = None
+            self.file = None
+
+
+def get_job_path(path, job):
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{job}{extension}"
+
+
+def read_last_success(path, job):
+    """Return the last success time a job's textfile recorded, or None"""
+    try:
+        with open(path, 'r') as file:
+            families = list(text_string_to_metric_families(file.read()))
+    except (OSError, ValueError):
+        return None
+    for family in families:
+        for sample in family.samples:
+            if sample.name == 'pipeline_last_success_timestamp_seconds' and sample.labels.get('job') == job:
+                return sample.value
+    return None
+
+
+def get_endpoint_label(url, keep_path=True):
+    """Label an endpoint by host and path. Drop the path of RPC urls, which end in an API key."""
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{parsed.path}" if keep_path else parsed.netloc
+
+
+METRICS = Metrics()
@@ -0,0 +1,123 @@
+import os
+import json
+import shutil
+from datetime import datetime, timezone
+from utils.query import read_sql_query
+
+SECONDS_PER_DAY = 86400
+
+
+def import_pyarrow():
+    # pyarrow is only needed when a Parquet dataset is written or read
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.dataset
+        return pyarrow
+    except ImportError:
+        raise ImportError("Parquet datasets require pyarrow, install it with `pip install -r requirements.txt`")
+
+
+def get_day(timestamp):
+    return int(timestamp) // SECONDS_PER_DAY
+
+
+def get_date(day):
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def get_dataset_dir(parquet_dir, table_name):
+    return os.path.join(parquet_dir, table_name)
+
+
+def has_dataset(parquet_dir, table_name):
+    return os.path.isdir(get_dataset_dir(parquet_dir, table_name))
+
+
+def get_partition_dir(parquet_dir, table_name, day):
+    return os.path.join(get_dataset_dir(parquet_dir, table_name), f"date={get_date(day)}")
+
+
+def get_table_days(conn, table_name):
+    cursor = conn.execute(
+        f"SELECT DISTINCT timestamp / {SECONDS_PER_DAY} FROM {table_name} ORDER BY 1")
+    return [day for (day,) in cursor.fetchall()]
+
+
+def get_stored_days(conn, table_name, ids):
+    """Return the days of the rows already stored under the given ids.
+
+    Rows of mutable entities can move to another day when they are updated,
+    which changes the partition they were in as well.
+    """
+    cursor = conn.execute(
+        f"SELECT DISTINCT timestamp / {SECONDS_PER_DAY} FROM {table_name} WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps(ids),))
+    return {day for (day,) in cursor.fetchall()}
+
+
+def write_partition(conn, table_name, parquet_dir, day):
+    """Rewrite the Parquet file of one day of a table from its SQLite rows"""
+    pa = import_pyarrow()
+    df = read_sql_query(
+        f"""SELECT * FROM {table_name}
+        WHERE timestamp >= {day * SECONDS_PER_DAY} AND timestamp < {(day + 1) * SECONDS_PER_DAY}""",
+        conn, table_name)
+    # Sorted rows give each row group tight min/max statistics to skip on
+    sort_columns = [col for col in ['asset', 'timestamp'] if col in df.columns]
+    df = df.sort_values(sort_columns, kind='stable')
+
+    partition_dir = get_partition_dir(parquet_dir, table_name, day)
+    os.makedirs(partition_dir, exist_ok=True)
+    tmp_path = os.path.join(partition_dir, 'part-0.parquet.tmp')
+    pa.parquet.write_table(
+        pa.Table.from_pandas(df, preserve_index=False), tmp_path, row_group_size=65536)
+    os.replace(tmp_path, os.path.join(partition_dir, 'part-0.parquet'))
+
+
+def write_partitions(conn, table_name, parquet_dir, days=None):
+    """Write the Parquet partitions of the given days, or rebuild the whole dataset of a table.
+
+    The dataset is partitioned by entity and day, e.g.
+    `<parquet_dir>/trades/date=2023-07-22/part-0.parquet`. It is also rebuilt
+    when its directory doesn't exist, since the given days would only make
+    part of it.
+    """
+    if days is None or not has_dataset(parquet_dir, table_name):
+        shutil.rmtree(get_dataset_dir(parquet_dir, table_name), ignore_errors=True)
+        days = get_table_days(conn, table_name)
+    for day in sorted(days):
+        write_partition(conn, table_name, parquet_dir, day)
+    return len(days)
+
+
+def read_parquet(parquet_dir, table_name, columns=None, start=None, end=None, assets=None):
+    """Read a table from its Parquet dataset, only loading the columns and days asked for.
+
+    `start` and `end` are unix timestamps bounding `timestamp` (end exclusive),
+    and `assets` limits the rows to a list of assets.
+    """
+    pa = import_pyarrow()
+    ds = pa.dataset
+
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    dataset = ds.dataset(
+        get_dataset_dir(parquet_dir, table_name), format='parquet', partitioning=partitioning)
+    # Filtering on the partition date skips whole files, the timestamp and
+    # asset filters skip row groups within them
+    filters = []
+    if start is not None:
+        filters.append(ds.field('date') >= get_date(get_day(start)))
+        filters.append(ds.field('timestamp') >= start)
+    if end is not None:
+        filters.append(ds.field('date') <= get_date(get_day(end)))
+        filters.append(ds.field('timestamp') < end)
+    if assets is not None:
+        filters.append(ds.field('asset').isin(assets))
+
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'date']
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
@@ -0,0 +1,44 @@
+import pandas as pd
+
+
+def create_column_scales(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS column_scales (
+            table_name TEXT,
+            column_name TEXT,
+            scale INTEGER,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+
+
+def get_column_scales(conn, table_name):
+    """Return the number of decimals of every scaled integer column of a table"""
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'column_scales'")
+    if cursor.fetchone() is None:
+        return {}
+    cursor = conn.execute(
+        "SELECT column_name, scale FROM column_scales WHERE table_name = ?", (table_name,))
+    return dict(cursor.fetchall())
+
+
+def save_column_scales(conn, table_name, scales):
+    create_column_scales(conn)
+    conn.execute("DELETE FROM column_scales WHERE table_name = ?", (table_name,))
+    conn.executemany(
+        "INSERT INTO column_scales (table_name, column_name, scale) VALUES (?, ?, ?)",
+        [(table_name, column, scale) for column, scale in scales.items()])
+
+
+def read_sql_query(sql, conn, table_name):
+    """Run a query against a table and rescale its scaled integer columns to floats.
+
+    Result columns are matched by name, so aggregates should keep the column
+    name, e.g. `SELECT asset, SUM(size) AS size FROM trades GROUP BY asset`.
+    """
+    df = pd.read_sql_query(sql, conn)
+    for column, scale in get_column_scales(conn, table_name).items():
+        if column in df.columns:
+            df[column] = df[column] / 10**scale
+    return df
@@ -0,0 +1,32 @@
+import time
+import random
+from email.utils import parsedate_to_datetime
+
+# HTTP statuses of requests the server throttled
+THROTTLED_STATUSES = {429, 503}
+
+
+def parse_retry_after(headers):
+    """Return the Retry-After header in seconds, whether given as seconds or an HTTP date"""
+    value = headers.get('Retry-After') if headers else None
+    if value is None:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        try:
+            return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt, base_delay, max_delay, retry_after=None):
+    """Return the seconds to wait before retrying a request.
+
+    That is the server's `retry_after` when it gave one, otherwise an
+    exponential backoff from `base_delay` up to `max_delay`.
+    """
+    if retry_after is not None:
+        return retry_after
+    # Full jitter keeps concurrent retries from arriving together
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
@@ -0,0 +1,182 @@
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+import aiohttp
+from utils.metrics import METRICS, get_endpoint_label
+from utils.retry import THROTTLED_STATUSES, backoff_delay, parse_retry_after
+from utils.subgraph import REQUEST_TIMEOUT
+
+# Returned per request by Infura and other providers when a batch exceeds
+# their rate limit
+THROTTLED_CODES = {-32005, 429}
+
+RETRIED_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError)
+
+
+class RpcError(Exception):
+    """An error returned for one request of a JSON-RPC batch"""
+
+    def __init__(self, error):
+        self.code = error.get('code')
+        super().__init__(f"{error.get('message')} ({self.code})")
+
+
+def get_backoff_seconds(error):
+    # Infura says how long to back off in the data of a throttled request
+    data = error.get('data')
+    rate = data.get('rate') if isinstance(data, dict) else None
+    return rate.get('backoff_seconds') if isinstance(rate, dict) else None
+
+
+class ThrottledError(Exception):
+    def __init__(self, retry_after=None):
+        self.retry_after = retry_after
+        super().__init__(f"throttled, retry after {retry_after}s")
+
+
+class BatchRpc:
+    """Sends JSON-RPC requests made around the same time to an endpoint as one batch payload.
+
+    Requests wait until `max_batch_size` are queued or `max_wait` seconds have
+    passed, then go out together and each caller gets its own result back by
+    id. An error returned for one request raises RpcError to its caller only.
+    Failed and throttled batches are retried with backoff, and requests the
+    provider throttled within a batch are sent again on their own.
+    """
+
+    def __init__(self, session, url, max_batch_size=100, max_wait=0.01, max_batches=4,
+                 max_retries=6, base_delay=1, max_delay=60):
+        self.session = session
+        self.url = url
+        self.target = get_endpoint_label(url, keep_path=False)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.semaphore = asyncio.Semaphore(max_batches)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queued = []
+        self.flush_handle = None
+        self.tasks = set()
+        self.next_id = 0
+
+    async def request(self, method, params):
+        future = asyncio.get_running_loop().create_future()
+        self.next_id += 1
+        self.queued.append(({'jsonrpc': '2.0', 'id': self.next_id, 'method': method, 'params': params}, future))
+        if len(self.queued) >= self.max_batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.max_wait, self.flush)
+        return await future
+
+    async def get_block(self, block_number):
+        """Return the header of a block, or of a tag like 'latest', with its number and timestamp as ints"""
+        block_tag = hex(block_number) if isinstance(block_number, int) else block_number
+        block = await self.request('eth_getBlockByNumber', [block_tag, False])
+        if block is None:
+            raise RpcError({'message': f"block {block_number} not found"})
+        return {**block, 'number': int(block['number'], 16), 'timestamp': int(block['timestamp'], 16)}
+
+    async def call(self, to, data, block_number):
+        """Run an eth_call at a block, returning its output bytes"""
+        result = await self.request('eth_call', [{'to': to, 'data': data}, hex(block_number)])
+        return bytes.fromhex(result[2:])
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.queued = self.queued, []
+        if len(batch) > 0:
+            # Keep a reference so the task isn't garbage collected while it runs
+            task = asyncio.ensure_future(self.send(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def send(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                responses = await self.post([request for request, _ in batch])
+            except (ThrottledError, *RETRIED_ERRORS) as error:
+                METRICS.retry(self.target, type(error).__name__)
+                if attempt == self.max_retries:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                    return
+                delay = self.get_retry_delay(error, attempt)
+                print(f"RETRYING {len(batch)} RPC REQUESTS IN {delay:.1f}s AFTER {type(error).__name__}: {error}")
+                await asyncio.sleep(delay)
+                continue
+            except RpcError as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+
+            by_id = {response.get('id'): response for response in responses}
+            throttled = []
+            for request, future in batch:
+                response = by_id.get(request['id'])
+                if future.done():
+                    # The caller was cancelled
+                    continue
+                elif response is None:
+                    future.set_exception(RpcError({'message': "no response in batch"}))
+                elif 'error' in response and response['error'].get('code') in THROTTLED_CODES \
+                        and attempt < self.max_retries:
+                    throttled.append((request, future))
+                elif 'error' in response:
+                    future.set_exception(RpcError(response['error']))
+                else:
+                    future.set_result(response['result'])
+            if len(throttled) == 0:
+                return
+
+            batch = throttled
+            METRICS.retry(self.target, 'ThrottledError')
+            backoffs = [get_backoff_seconds(by_id[request['id']]['error']) for request, _ in batch]
+            backoffs = [seconds for seconds in backoffs if seconds is not None]
+            delay = self.get_retry_delay(ThrottledError(max(backoffs) if len(backoffs) > 0 else None), attempt)
+            print(f"RETRYING {len(batch)} THROTTLED RPC REQUESTS IN {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def post(self, payload):
+        async with self.semaphore:
+            start = time.monotonic()
+            async with self.session.post(self.url, json=payload) as response:
+                if response.status in THROTTLED_STATUSES:
+                    raise ThrottledError(parse_retry_after(response.headers))
+                response.raise_for_status()
+                headers = response.headers
+                body = await response.read()
+            METRICS.observe('rpc', self.target, time.monotonic() - start, rows=len(payload), bytes=len(body))
+
+        responses = json.loads(body)
+        # Providers answer a batch they reject outright with a single error object
+        if not isinstance(responses, list):
+            error = responses.get('error', {})
+            if error.get('code') in THROTTLED_CODES:
+                retry_after = parse_retry_after(headers)
+                raise ThrottledError(retry_after if retry_after is not None else get_backoff_seconds(error))
+            raise RpcError(error)
+        return responses
+
+    def get_retry_delay(self, error, attempt):
+        retry_after = error.retry_after if isinstance(error, ThrottledError) else None
+        return backoff_delay(attempt, self.base_delay, self.max_delay, retry_after)
+
+
+@asynccontextmanager
+async def open_rpc(url, **kwargs):
+    """Open a BatchRpc on its own HTTP session"""
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        rpc = BatchRpc(session, url, **kwargs)
+        try:
+            yield rpc
+        finally:
+            for task in rpc.tasks:
+                task.cancel()
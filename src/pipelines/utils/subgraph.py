@@ -0,0 +1,370 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import asynccontextmanager, AsyncExitStack
+import aiohttp
+from gql import Client, gql
+from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import TransportServerError, TransportQueryError, TransportProtocolError
+from graphql import build_client_schema, get_introspection_query
+from utils.metrics import METRICS, get_endpoint_label
+from utils.retry import THROTTLED_STATUSES, backoff_delay, parse_retry_after
+
+SCHEMA_CACHE_DIR = os.getenv(
+    'SCHEMA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'kwenta-data', 'schemas'))
+
+META_QUERY = gql("""
+    query {
+        _meta {
+            deployment
+        }
+    }
+""")
+
+HEAD_BLOCK_QUERY = gql("""
+    query {
+        _meta {
+            block {
+                number
+            }
+        }
+    }
+""")
+
+# Largest page graph-node serves
+MAX_PAGE_SIZE = 1000
+
+REQUEST_TIMEOUT = 60
+
+RETRIED_ERRORS = (
+    TransportServerError, TransportQueryError, TransportProtocolError,
+    aiohttp.ClientError, asyncio.TimeoutError,
+)
+
+
+class SubgraphTransport(AIOHTTPTransport):
+    """An AIOHTTPTransport that keeps the response headers on the server errors it raises.
+
+    The transport only saves the headers of successful responses, and on
+    itself where concurrent requests overwrite them, so a throttled request's
+    Retry-After is read from its own error instead.
+    """
+
+    async def execute(self, *args, **kwargs):
+        try:
+            return await super().execute(*args, **kwargs)
+        except TransportServerError as error:
+            # gql raises these from aiohttp's error for the response
+            cause = error.__cause__
+            error.headers = cause.headers if isinstance(cause, aiohttp.ClientResponseError) else None
+            raise
+
+
+class FetchController:
+    """Runs queries on a gql session with retries, adapting concurrency and page size to the endpoint.
+
+    Both follow additive increase, multiplicative decrease: fast successful
+    requests raise them a step at a time, slow requests lower the number in
+    flight, throttling halves it and other failures halve both. Queries with a
+    `first` variable get the current page size written into their variables,
+    so callers can compare the page they got with the size they asked for.
+    """
+
+    def __init__(self, session, max_concurrency=8, min_page_size=100, target_latency=10,
+                 max_retries=6, base_delay=1, max_delay=120, target=None, received=None):
+        self.session = session
+        self.client = session.client
+        # Metrics label of the endpoint, and the response bytes counted by
+        # the session's trace config
+        self.target = target
+        self.received = received if received is not None else {'bytes': 0}
+        self.bytes_reported = 0
+        self.consecutive_errors = 0
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.min_page_size = min_page_size
+        self.page_size = MAX_PAGE_SIZE
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.concurrency))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self, latency):
+        self.consecutive_errors = 0
+        if latency > self.target_latency:
+            self.concurrency = max(1, self.concurrency * 0.75)
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.page_size = min(MAX_PAGE_SIZE, self.page_size + self.min_page_size)
+
+    def on_error(self, error):
+        self.consecutive_errors += 1
+        self.concurrency = max(1, self.concurrency / 2)
+        if not is_throttled(error):
+            # Timeouts and server errors are often caused by expensive pages
+            self.page_size = max(self.min_page_size, self.page_size // 2)
+
+    def get_retry_delay(self, error, attempt):
+        retry_after = parse_retry_after(getattr(error, 'headers', None)) if is_throttled(error) else None
+        return backoff_delay(attempt, self.base_delay, self.max_delay, retry_after)
+
+    async def execute(self, query, variable_values=None):
+        for attempt in range(self.max_retries + 1):
+            if variable_values is not None and 'first' in variable_values:
+                variable_values['first'] = self.page_size
+
+            await self.acquire()
+            start = time.monotonic()
+            try:
+                result = await self.session.execute(query, variable_values=variable_values)
+                latency = time.monotonic() - start
+                self.on_success(latency)
+                self.record_fetch(result, latency)
+                return result
+            except RETRIED_ERRORS as error:
+                self.on_error(error)
+                METRICS.retry(self.target, type(error).__name__)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.get_retry_delay(error, attempt)
+                print(f"RETRYING IN {delay:.1f}s AFTER {type(error).__name__}: {error}")
+            finally:
+                await self.release()
+            await asyncio.sleep(delay)
+
+
+    def record_fetch(self, result, latency):
+        rows = sum(len(value) for value in result.values() if isinstance(value, list))
+        # Bytes are counted per endpoint as responses stream in, so with
+        # concurrent requests each fetch reports what arrived since the last
+        received = self.received['bytes'] - self.bytes_reported
+        self.bytes_reported += received
+        METRICS.observe('fetch', self.target, latency, rows=rows, bytes=received)
+
+
+class EndpointPool:
+    """Sends queries to mirrors of a subgraph, hedging slow requests and failing over from degraded mirrors.
+
+    Requests go to the first healthy endpoint in configured order. One still
+    running after the `hedge_percentile` of that endpoint's recent latencies
+    is also sent to the next endpoint, and the first answer wins. An endpoint
+    is degraded for `cooldown` seconds after `failure_threshold` errors in a
+    row, a failed request, or that many hedges in a row won by another
+    endpoint. Has the same execute method as FetchController.
+    """
+
+    def __init__(self, controllers, hedge_percentile=90, default_hedge_delay=10, min_hedge_delay=0.5,
+                 min_samples=10, window=100, failure_threshold=3, cooldown=60):
+        self.controllers = controllers
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies = {controller: deque(maxlen=window) for controller in controllers}
+        self.lost_hedges = {controller: 0 for controller in controllers}
+        self.degraded_until = {controller: 0 for controller in controllers}
+        self.primary = controllers[0]
+        self.hedges = 0
+
+    def is_degraded(self, controller):
+        return (controller.consecutive_errors >= self.failure_threshold
+                or time.monotonic() < self.degraded_until[controller])
+
+    def degrade(self, controller):
+        self.degraded_until[controller] = time.monotonic() + self.cooldown
+        self.lost_hedges[controller] = 0
+        # The cooldown covers the errors so far, so they don't keep the
+        # endpoint degraded once it ends
+        controller.consecutive_errors = 0
+
+    def get_ranked(self):
+        ranked = sorted(self.controllers, key=self.is_degraded)
+        if ranked[0] is not self.primary:
+            print(f"FAILING OVER FROM {self.primary.target} TO {ranked[0].target}")
+            self.primary = ranked[0]
+        return ranked
+
+    def get_hedge_delay(self, controller):
+        latencies = sorted(self.latencies[controller])
+        if len(latencies) < self.min_samples:
+            return self.default_hedge_delay
+        index = min(len(latencies) - 1, len(latencies) * self.hedge_percentile // 100)
+        return max(self.min_hedge_delay, latencies[index])
+
+    async def attempt(self, controller, query, variable_values):
+        # Every attempt gets its own variables, since controllers set their own page size
+        variables = dict(variable_values) if variable_values is not None else None
+        start = time.monotonic()
+        try:
+            result = await controller.execute(query, variable_values=variables)
+        except Exception:
+            self.degrade(controller)
+            raise
+        self.latencies[controller].append(time.monotonic() - start)
+        return controller, result, variables
+
+    async def execute(self, query, variable_values=None):
+        ranked = self.get_ranked()
+        first = ranked[0]
+        waiting = ranked[1:]
+        tasks = {asyncio.ensure_future(self.attempt(first, query, variable_values))}
+        error = None
+        try:
+            while True:
+                timeout = self.get_hedge_delay(first) if len(waiting) > 0 else None
+                done, tasks = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    controller, result, variables = task.result()
+                    if controller is first:
+                        self.lost_hedges[first] = 0
+                    else:
+                        self.lost_hedges[first] += 1
+                        if self.lost_hedges[first] >= self.failure_threshold:
+                            self.degrade(first)
+                    if variable_values is not None:
+                        variable_values.update(variables)
+                    return result
+
+                if len(waiting) > 0 and (len(done) == 0 or len(tasks) == 0):
+                    # Hedge a slow request, or fail over from a failed one
+                    if len(done) == 0:
+                        self.hedges += 1
+                    tasks.add(asyncio.ensure_future(self.attempt(waiting.pop(0), query, variable_values)))
+                elif len(tasks) == 0:
+                    raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def get_trace_config(received):
+    """Count the response bytes of an aiohttp session"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_response_chunk_received(session, context, params):
+        received['bytes'] += len(params.chunk)
+
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    return trace_config
+
+
+def is_throttled(error):
+    return isinstance(error, TransportServerError) and error.code in THROTTLED_STATUSES
+
+
+def get_schema_path(url, deployment):
+    url_hash = hashlib.sha256(url.encode()).hexdigest()[:16]
+    return os.path.join(SCHEMA_CACHE_DIR, f"{url_hash}-{deployment}.json")
+
+
+async def get_deployment(controller):
+    # Endpoints without _meta are not graph-node subgraphs, so their schema
+    # can't be tied to a deployment and is always fetched. This is asked once
+    # without retries, since failing only skips the cache.
+    try:
+        result = await controller.session.execute(META_QUERY)
+        return result['_meta']['deployment']
+    except Exception:
+        return None
+
+
+async def get_head_block(session):
+    """Return the latest block the subgraph has indexed.
+
+    For mirrors this is the lowest head of the ones that answer a single
+    attempt, so a block watermark never runs ahead of whichever mirror serves
+    the next request.
+    """
+    if isinstance(session, EndpointPool):
+        results = await asyncio.gather(
+            *[controller.session.execute(HEAD_BLOCK_QUERY) for controller in session.controllers],
+            return_exceptions=True)
+        blocks = [result['_meta']['block']['number'] for result in results if not isinstance(result, Exception)]
+        if len(blocks) > 0:
+            return min(blocks)
+    result = await session.execute(HEAD_BLOCK_QUERY)
+    return result['_meta']['block']['number']
+
+
+async def load_schema(controller, url):
+    """Set the session's schema from the on-disk cache, introspecting only when the deployment changed"""
+    deployment = await get_deployment(controller)
+    schema_path = get_schema_path(url, deployment) if deployment else None
+
+    if schema_path is not None and os.path.exists(schema_path):
+        with open(schema_path, 'r') as file:
+            introspection = json.load(file)
+    else:
+        print(f"FETCHING SCHEMA FOR {url}")
+        introspection = await controller.execute(gql(get_introspection_query()))
+        if schema_path is not None:
+            os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{schema_path}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(introspection, file)
+            os.replace(tmp_path, schema_path)
+
+    controller.client.introspection = introspection
+    controller.client.schema = build_client_schema(introspection)
+
+
+@asynccontextmanager
+async def open_session(url, headers=None, max_concurrency=8, mirrors=None):
+    """Open a gql session that validates queries against a cached copy of the subgraph schema.
+
+    The session is wrapped in a FetchController, which has the same execute
+    method and retries failed requests. With `mirrors`, urls serving the same
+    subgraph, a session is opened to each and they are wrapped in an
+    EndpointPool. Endpoints that fail to open in time are skipped.
+    """
+    if not mirrors:
+        async with open_controller(url, headers, max_concurrency) as controller:
+            yield controller
+        return
+
+    async with AsyncExitStack() as stack:
+        controllers = []
+        for endpoint in [url] + list(mirrors):
+            try:
+                # A mirror that is down shouldn't hold up the others for every retry
+                controllers.append(await asyncio.wait_for(
+                    stack.enter_async_context(open_controller(endpoint, headers, max_concurrency)),
+                    REQUEST_TIMEOUT))
+            except Exception as error:
+                print(f"SKIPPING ENDPOINT {get_endpoint_label(endpoint)}: {error}")
+        if len(controllers) == 0:
+            raise RuntimeError(f"No endpoint of {url} could be opened")
+        yield EndpointPool(controllers)
+
+
+@asynccontextmanager
+async def open_controller(url, headers=None, max_concurrency=8):
+    received = {'bytes': 0}
+    transport = SubgraphTransport(
+        url=url, headers=headers, timeout=REQUEST_TIMEOUT,
+        client_session_args={'trace_configs': [get_trace_config(received)]})
+    async with Client(transport=transport) as session:
+        controller = FetchController(
+            session, max_concurrency=max_concurrency, target=get_endpoint_label(url), received=received)
+        await load_schema(controller, url)
+        yield controller
@@ -1,22 +1,26 @@
 import time
+from functools import cached_property
 from web3 import Web3
 from web3.exceptions import ValidationError
 from eth_account import Account
 from eth_utils import from_wei
 from typing import Any, Dict, List, Optional, Tuple, Callable, Union
+from utils.contracts import get_contract
 
 class SmartContract:
-    def __init__(self, abi: List[Dict[str, Any]], contract_address: str, provider: str):
-        self.abi = abi
-        self.contract_address = Web3.toChecksumAddress(contract_address)
+    def __init__(self, abi: Union[str, List[Dict[str, Any]]], contract_address: str, provider: str,
+                 chain: str = "optimism"):
+        # The ABI is parsed and its functions compiled once per contract and process
+        self.registered = get_contract(chain, contract_address, abi)
+        self.abi = self.registered.abi
+        self.contract_address = self.registered.address
         self.web3 = Web3(Web3.HTTPProvider(provider))
-        self.contract = self.web3.eth.contract(
-            address=self.contract_address, abi=self.abi)
+        self.abi_map = self.registered.abi_map
 
-        self.abi_map = {
-            abi_entry["name"]: abi_entry
-            for abi_entry in self.abi if abi_entry["type"] == "function"
-        }
+    @cached_property
+    def contract(self):
+        # Only transactions and gas estimates go through a web3 contract
+        return self.web3.eth.contract(address=self.contract_address, abi=self.abi)
 
     def cast_output_types(self, raw_result, output_abi):
         if "components" not in output_abi:
@@ -36,10 +40,9 @@ class SmartContract:
             return raw_result
 
     def call_function(self, function_name: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
-        contract_function = self.contract.get_function_by_name(function_name)
         output_abi = self.abi_map[function_name]["outputs"]
 
-        raw_result = contract_function(*args, **kwargs).call()
+        raw_result = self.registered.call(self.web3, function_name, *args, **kwargs)
 
         if not isinstance(raw_result, tuple):
             raw_result = (raw_result,)
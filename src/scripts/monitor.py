@@ -1,5 +1,5 @@
 import os
-import json
+import sys
 import asyncio
 import pandas as pd
 from datetime import datetime, timezone
@@ -9,7 +9,10 @@ from decimal import Decimal
 from multicall import Call, Multicall
 from web3 import Web3
 import nest_asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipelines"))
 from libs.smart_contract import SmartContract
+from utils.contracts import CONTRACTS
 
 nest_asyncio.apply()
 
@@ -17,17 +20,14 @@ nest_asyncio.apply()
 INFURA_KEY = os.getenv('INFURA_KEY')
 RPC_ENDPOINT = f'https://optimism-mainnet.infura.io/v3/{INFURA_KEY}'
 
-## contracts and ABIs
-with open('./src/abi/PerpsV2Data.json', 'r') as file:
-    PerpsV2DataAbi = json.load(file)
-
-PerpsV2DataAddress = "0xF7D3D05cCeEEcC9d77864Da3DdE67Ce9a0215A9D"
+## contracts
+PerpsV2DataAddress = CONTRACTS['optimism']['PerpsV2Data']
 
 # get a web3 provider
 w3 = Web3(Web3.HTTPProvider(RPC_ENDPOINT))
 
 async def main():
-  perpsData = SmartContract(PerpsV2DataAbi, PerpsV2DataAddress, RPC_ENDPOINT)
+  perpsData = SmartContract('PerpsV2Data', PerpsV2DataAddress, RPC_ENDPOINT)
   
   globals = perpsData.call_function('globals')
   print(globals, '\n')
@@ -1,12 +1,16 @@
 import os
+import sys
+import time
 import asyncio
-import pandas as pd
-from gql import Client, gql
-from gql.transport.aiohttp import AIOHTTPTransport
-from decimal import Decimal
+from gql import gql
 from web3 import Web3
 import nest_asyncio
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipelines"))
+from utils.data import decode_pages
+from utils.subgraph import open_session, MAX_PAGE_SIZE
+from utils.metrics import METRICS
+
 nest_asyncio.apply()
 
 # Constants
@@ -17,14 +21,14 @@ V3_Query = {
     "aggregate_stats": {
         "query": gql(
             """
-                    query aggregateStats($last_id: ID!) {
+                    query aggregateStats($last_id: ID!, $first: Int!) {
                         perpsV3AggregateStats(
                             where: {
                                 id_gt: $last_id,
                                 period: "86400",
                                 marketId: "0",
                             },
-                            first: 1000
+                            first: $first
                         ) {
                             id
                             timestamp
@@ -35,16 +39,17 @@ V3_Query = {
                 """
         ),
         "accessor": "perpsV3AggregateStats",
+        "types": {"id": "string", "timestamp": "number", "volume": "decimal", "trades": "number"},
     },
     "traders": {
         "query": gql(
             """
-                    query traders($last_id: ID!) {
+                    query traders($last_id: ID!, $first: Int!) {
                         orderSettleds(
                             where: {
                                 id_gt: $last_id,
                             },
-                            first: 1000
+                            first: $first
                         ) {
                             id
                             accountId
@@ -54,30 +59,34 @@ V3_Query = {
                 """
         ),
         "accessor": "orderSettleds",
+        "types": {"id": "string", "accountId": "string", "timestamp": "number"},
     },
 }
 
 CONFIGS = {
     "v3": {
         "subgraph_endpoint": "https://subgraph.satsuma-prod.com/05943208e921/kwenta/base-perps-v3/api",
+        # Other urls serving the same subgraph, used when the endpoint is slow or down
+        "subgraph_mirrors": [],
         "rpc_endpoint": f"https://base-mainnet.infura.io/v3/{INFURA_KEY}",
         "queries": V3_Query,
     },
     "v2": {
         "subgraph_endpoint": "https://subgraph.satsuma-prod.com/05943208e921/kwenta/optimism-perps/api",
+        "subgraph_mirrors": ["https://api.thegraph.com/subgraphs/name/kwenta/optimism-perps"],
         "rpc_endpoint": f"https://optimism-mainnet.infura.io/v3/{INFURA_KEY}",
         "queries": {
             "aggregate_stats": {
                 "query": gql(
                     """
-                    query aggregateStats($last_id: ID!) {
+                    query aggregateStats($last_id: ID!, $first: Int!) {
                         futuresAggregateStats(
                             where: {
                                 id_gt: $last_id,
                                 period: "86400",
                                 asset: "0x",
                             },
-                            first: 1000
+                            first: $first
                         ) {
                             id
                             timestamp
@@ -90,16 +99,24 @@ CONFIGS = {
                 """
                 ),
                 "accessor": "futuresAggregateStats",
+                "types": {
+                    "id": "string",
+                    "timestamp": "number",
+                    "volume": "decimal",
+                    "trades": "number",
+                    "feesSynthetix": "decimal",
+                    "feesKwenta": "decimal",
+                },
             },
             "traders": {
                 "query": gql(
                     """
-                    query traders($last_id: ID!) {
+                    query traders($last_id: ID!, $first: Int!) {
                         futuresTrades(
                             where: {
                                 id_gt: $last_id,
                             },
-                            first: 1000
+                            first: $first
                         ) {
                             id
                             account
@@ -109,23 +126,25 @@ CONFIGS = {
                 """
                 ),
                 "accessor": "futuresTrades",
+                "types": {"id": "string", "account": "string", "timestamp": "number"},
             },
         },
     },
     "perennial": {
         "subgraph_endpoint": "https://subgraph.perennial.finance/arbitrum",
+        "subgraph_mirrors": [],
         "rpc_endpoint": f"https://arbitrum-mainnet.infura.io/v3/{INFURA_KEY}",
         "queries": {
             "aggregate_stats": {
                 "query": gql(
                     """
-                    query aggregateStats($last_id: Bytes!) {
+                    query aggregateStats($last_id: Bytes!, $first: Int!) {
                         marketAccumulations(
                             where: {
                                 id_gt: $last_id,
                                 bucket: daily,
                             },
-                            first: 1000
+                            first: $first
                         ) {
                             id
                             timestamp
@@ -138,6 +157,14 @@ CONFIGS = {
                 """
                 ),
                 "accessor": "marketAccumulations",
+                "types": {
+                    "id": "string",
+                    "timestamp": "number",
+                    "longNotional": "number",
+                    "shortNotional": "number",
+                    "trades": "number",
+                    "traders": "number",
+                },
             },
         },
     },
@@ -145,82 +172,47 @@ CONFIGS = {
 
 
 # Functions
-def convert_decimals(x):
-    return Decimal(x) / Decimal(10**18)
-
-
-def convert_bytes(x):
-    return bytearray.fromhex(x[2:]).decode().replace("\x00", "")
-
-
-def clean_df(df, decimal_cols=[], bytes_cols=[]):
-    for col in decimal_cols:
-        if col in df.columns:
-            df[col] = df[col].apply(convert_decimals)
-        else:
-            print(f"{col} not in DataFrame")
-    for col in bytes_cols:
-        if col in df.columns:
-            df[col] = df[col].apply(convert_bytes)
-        else:
-            print(f"{col} not in DataFrame")
-    return df
-
-
-async def run_recursive_query(query, params, accessor, endpoint):
+async def run_recursive_query(query, params, accessor, types, endpoint, mirrors=None):
     headers = {"origin": "https://subgraph.satsuma-prod.com"}
-    transport = AIOHTTPTransport(url=endpoint, headers=headers)
-    async with Client(
-        transport=transport,
-        fetch_schema_from_transport=True,
-    ) as session:
+    async with open_session(endpoint, headers=headers, mirrors=mirrors) as session:
+        # The page size is adjusted by the session on every request
+        params["first"] = MAX_PAGE_SIZE
         done_fetching = False
-        all_results = []
+        pages = []
         while not done_fetching:
             result = await session.execute(query, variable_values=params)
             if len(result[accessor]) > 0:
-                all_results.extend(result[accessor])
-                params["last_id"] = all_results[-1]["id"]
-            else:
+                pages.append(result[accessor])
+                params["last_id"] = pages[-1][-1]["id"]
+            if len(result[accessor]) < params["first"]:
                 done_fetching = True
-        return pd.DataFrame(all_results)
+        # Decimals are parsed to floats and accounts stored as categoricals
+        return decode_pages(pages, types)
 
 
 async def main(config_key):
+    start = time.monotonic()
     config = CONFIGS[config_key]
 
     # Aggregate data query and cleaning
     agg_query = config["queries"]["aggregate_stats"]
-    df_agg = pd.DataFrame(
-        await run_recursive_query(
-            agg_query["query"],
-            {"last_id": ""},
-            agg_query["accessor"],
-            config["subgraph_endpoint"],
-        )
+    df_agg = await run_recursive_query(
+        agg_query["query"],
+        {"last_id": ""},
+        agg_query["accessor"],
+        agg_query["types"],
+        config["subgraph_endpoint"],
+        config["subgraph_mirrors"],
     )
     print(f"agg result size: {df_agg.shape[0]}")
-    df_agg = (
-        clean_df(
-            df_agg,
-            decimal_cols=(
-                ["volume", "feesSynthetix", "feesKwenta"]
-                if config_key == "v2"
-                else ["volume"]
-            ),
-        )
-        .drop("id", axis=1)
-        .sort_values("timestamp")
-    )
-    df_agg["timestamp"] = df_agg["timestamp"].astype(int)
-    df_agg["trades"] = df_agg["trades"].astype(int)
+    df_agg = df_agg.drop("id", axis=1).sort_values("timestamp")
 
     if config_key == "perennial":
         df_agg["volume"] = (
             df_agg["longNotional"].astype(float) / 1_000_000
             + df_agg["shortNotional"].astype(float) / 1_000_000
         )
-        df_agg["uniqueTraders"] = df_agg["traders"].astype(int)
+        df_agg["uniqueTraders"] = df_agg["traders"]
 
         df_agg = df_agg.groupby("timestamp").sum().reset_index()
         df_agg["cumulativeTrades"] = df_agg["trades"].cumsum()
@@ -240,20 +232,16 @@ async def main(config_key):
         # Trader data query and processing
         trader_query = config["queries"]["traders"]
         df_trader = (
-            pd.DataFrame(
-                await run_recursive_query(
-                    trader_query["query"],
-                    {"last_id": ""},
-                    trader_query["accessor"],
-                    config["subgraph_endpoint"],
-                )
+            await run_recursive_query(
+                trader_query["query"],
+                {"last_id": ""},
+                trader_query["accessor"],
+                trader_query["types"],
+                config["subgraph_endpoint"],
+                config["subgraph_mirrors"],
             )
-            .drop("id", axis=1)
-            .sort_values("timestamp")
-        )
-        df_trader["dateTs"] = df_trader["timestamp"].apply(
-            lambda x: int(int(x) / 86400) * 86400
-        )
+        ).drop("id", axis=1).sort_values("timestamp")
+        df_trader["dateTs"] = df_trader["timestamp"] // 86400 * 86400
         df_trader["cumulativeTraders"] = (
             ~df_trader["accountId" if "v3" in config_key else "account"].duplicated()
         ).cumsum()
@@ -289,8 +277,10 @@ async def main(config_key):
 
     # Print results
     print(f"Combined result size for {config_key}: {df_write.shape[0]}")
+    METRICS.observe("export", config_key, time.monotonic() - start, rows=df_write.shape[0])
 
 
 if __name__ == "__main__":
-    asyncio.run(main("v3"))
-    asyncio.run(main("v2"))
+    with METRICS.run("stats", os.getenv("METRICS_FILE")):
+        asyncio.run(main("v3"))
+        asyncio.run(main("v2"))
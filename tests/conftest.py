@@ -0,0 +1,9 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# The pipelines import their helpers as `utils.*`, and the tests serve
+# synthetic data with the benchmarks' fake subgraph
+sys.path.append(os.path.join(SRC_DIR, "pipelines"))
+sys.path.append(os.path.join(SRC_DIR, "benchmarks"))
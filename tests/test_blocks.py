@@ -0,0 +1,89 @@
+import asyncio
+import random
+import sqlite3
+from bisect import bisect_left
+from utils.blocks import BlockIndex, BlockResolver, get_missing_blocks
+
+
+def create_samples_table():
+    """A table sampled every 100 blocks, where block 300 failed and 500 wasn't reached yet"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE market_debt (block INTEGER, asset TEXT, marketDebt INTEGER)")
+    conn.executemany(
+        "INSERT INTO market_debt (block, asset, marketDebt) VALUES (?, ?, ?)",
+        [(100, 'ETH', 1), (100, 'BTC', 2), (200, 'ETH', 3), (200, 'BTC', 4), (400, 'ETH', 5)])
+    return conn
+
+
+def test_missing_blocks_of_a_range():
+    conn = create_samples_table()
+    assert get_missing_blocks(conn, 'market_debt', range(100, 600, 100)) == [300, 500]
+    assert get_missing_blocks(conn, 'market_debt', range(0, 250, 50)) == [0, 50, 150]
+    assert get_missing_blocks(conn, 'market_debt', range(100, 300, 100)) == []
+    assert get_missing_blocks(conn, 'market_debt', range(600, 600, 100)) == []
+
+
+def test_missing_blocks_of_a_list():
+    conn = create_samples_table()
+    assert get_missing_blocks(conn, 'market_debt', [100, 250, 300, 400, 450]) == [250, 300, 450]
+    assert get_missing_blocks(conn, 'market_debt', [100, 200]) == []
+    assert get_missing_blocks(conn, 'market_debt', []) == []
+
+
+def test_range_and_list_plans_agree():
+    conn = create_samples_table()
+    for sample_blocks in [range(0, 1000, 100), range(50, 450, 25), range(100, 101)]:
+        assert get_missing_blocks(conn, 'market_debt', sample_blocks) == \
+            get_missing_blocks(conn, 'market_debt', list(sample_blocks))
+
+
+class FakeRpc:
+    """Serves blocks 1 to 500 with uneven block times, some of them sharing a timestamp"""
+
+    def __init__(self, seed=0):
+        rng = random.Random(seed)
+        self.timestamps = []
+        timestamp = 1_600_000_000
+        for _ in range(500):
+            self.timestamps.append(timestamp)
+            timestamp += rng.choice([0, 1, 2, 2, 2, 15, 120])
+        self.head = 500
+
+    async def get_block(self, number):
+        number = self.head if number == 'latest' else number
+        return {'number': number, 'timestamp': self.get_timestamp(number)}
+
+    def get_timestamp(self, number):
+        return self.timestamps[number - 1]
+
+    def get_first_block(self, timestamp):
+        i = bisect_left(self.timestamps, timestamp)
+        return i + 1 if i < len(self.timestamps) else None
+
+
+def resolve(rpc, timestamps):
+    async def resolve_all():
+        resolver = BlockResolver(rpc, BlockIndex(sqlite3.connect(':memory:'), 'optimism'))
+        return [await resolver.resolve(timestamp) for timestamp in timestamps]
+    return asyncio.run(resolve_all())
+
+
+def test_resolve_returns_the_first_block_at_or_after_a_timestamp():
+    rpc = FakeRpc()
+    timestamps = list(range(rpc.get_timestamp(1) - 5, rpc.get_timestamp(rpc.head) + 5))
+    random.Random(0).shuffle(timestamps)
+    assert resolve(rpc, timestamps) == [rpc.get_first_block(timestamp) for timestamp in timestamps]
+
+
+def test_resolve_boundaries():
+    rpc = FakeRpc()
+    first, head = rpc.get_timestamp(1), rpc.get_timestamp(rpc.head)
+    # Blocks 5 and 6 share a timestamp with this seed
+    assert rpc.get_timestamp(5) == rpc.get_timestamp(6) > rpc.get_timestamp(4)
+
+    assert resolve(rpc, [rpc.get_timestamp(6)]) == [5]
+    assert resolve(rpc, [rpc.get_timestamp(250)]) == [rpc.get_first_block(rpc.get_timestamp(250))]
+    assert resolve(rpc, [first - 100]) == [1]
+    assert resolve(rpc, [first]) == [1]
+    assert resolve(rpc, [head]) == [rpc.get_first_block(head)]
+    assert resolve(rpc, [head + 1]) == [None]
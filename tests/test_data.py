@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.data import cleanDecimals, cleanScaledDecimals, convertDecimals, parseScaledDecimals
+
+INT64_MAX = np.iinfo(np.int64).max
+INT64_MIN = np.iinfo(np.int64).min
+
+
+def test_clean_decimals_matches_per_value_conversion():
+    values = ['1500000000000000000', '-2', '1' * 40, '-' + '9' * 37, '0']
+    expected = [convertDecimals(x) for x in values]
+    assert cleanDecimals(pd.Series(values)).tolist() == expected
+
+
+def test_clean_decimals_keeps_nulls_as_nan():
+    result = cleanDecimals(pd.Series(['1000000000000000000', None]))
+    assert result.dtype == np.float64
+    assert result[0] == 1.0 and np.isnan(result[1])
+
+
+def test_clean_decimals_falls_back_for_values_that_arent_integers():
+    values = ['1.5', '1e5', '', 'abc', ' 1', '1-', '--1']
+    expected = [convertDecimals(x) for x in values]
+    assert expected[:3] == [1.5e-18, 1e-13, '']
+    assert cleanDecimals(pd.Series(values)).tolist() == expected
+
+
+def test_clean_decimals_keeps_nulls_beside_unparsed_values():
+    result = cleanDecimals(pd.Series(['1000000000000000000', None, 'abc']))
+    assert result[0] == 1.0 and pd.isna(result[1]) and result[2] == 'abc'
+
+
+def test_parse_scaled_decimals_rounds_half_away_from_zero():
+    values = ['1234500000000000000', '-1234500000000000000', '1234400000000000000', '5000000000000000']
+    assert parseScaledDecimals(values, 3).tolist() == [1235, -1235, 1234, 5]
+    assert parseScaledDecimals(values, 18).tolist() == [int(x) for x in values]
+
+
+def test_parse_scaled_decimals_at_the_int64_bounds():
+    assert parseScaledDecimals([str(INT64_MAX), str(INT64_MIN)], 18).tolist() == [INT64_MAX, INT64_MIN]
+    # 92233720368.54775807 is the largest value with 8 decimals
+    assert parseScaledDecimals(['92233720368547758074999999999'], 8).tolist() == [INT64_MAX]
+    assert parseScaledDecimals(['-92233720368547758080000000000'], 8).tolist() == [INT64_MIN]
+
+
+@pytest.mark.parametrize('value, scale', [
+    (str(INT64_MAX + 1), 18),
+    (str(INT64_MIN - 1), 18),
+    ('9999999999999999999', 18),
+    # Only the round up passes the bound
+    ('92233720368547758075000000000', 8),
+    ('-92233720368547758085000000000', 8),
+    ('1' * 40, 0),
+])
+def test_parse_scaled_decimals_rejects_values_past_int64(value, scale):
+    with pytest.raises(ValueError):
+        parseScaledDecimals([value], scale)
+
+
+@pytest.mark.parametrize('scale', [-1, 19])
+def test_parse_scaled_decimals_rejects_scales_outside_0_to_18(scale):
+    with pytest.raises(ValueError):
+        parseScaledDecimals(['1'], scale)
+
+
+def test_parse_scaled_decimals_converts_values_that_arent_integers():
+    assert parseScaledDecimals(['1e18', '2500000000000000000.4'], 0).tolist() == [1, 3]
+    with pytest.raises(ValueError):
+        parseScaledDecimals([''], 2)
+
+
+def test_clean_scaled_decimals_keeps_nulls_as_none():
+    assert cleanScaledDecimals(pd.Series(['1500000000000000000', None]), 2).tolist() == [150, None]
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import pandas as pd
+import pytest
+import export_to_sqlite
+import utils.subgraph
+from utils.subgraph import open_session
+from fake_subgraph import load_entities, create_app, start_server
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pipelines", "configs")
+
+
+@pytest.fixture(autouse=True)
+def schema_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.subgraph, 'SCHEMA_CACHE_DIR', str(tmp_path / 'schemas'))
+
+
+def read_config(name, url, database_file):
+    with open(os.path.join(CONFIG_DIR, name), 'r') as file:
+        config = json.load(file)
+    return dict(config, graphql_url=url, database_file=str(database_file))
+
+
+async def sync(entities, config_names, database_file, backfill=None, shards=1, batch_size=10000):
+    """Sync some entity configs from a fake subgraph, returning the number of queries they took"""
+    app = create_app(entities)
+    runner, url = await start_server(app)
+    args = argparse.Namespace(
+        backfill=backfill, shards=shards, concurrency=4, batch_size=batch_size, parquet_dir=None)
+    configs = [read_config(name, url, database_file) for name in config_names]
+    try:
+        async with open_session(url) as session:
+            db = export_to_sqlite.Database(str(database_file), bulk_load=backfill == True)
+            try:
+                refresh_batch = export_to_sqlite.RefreshBatch(session, 0 if backfill else len(configs))
+                requests = app['stats']['requests']
+                await asyncio.gather(*[
+                    export_to_sqlite.sync_entity(config, session, db, refresh_batch, args)
+                    for config in configs])
+                return app['stats']['requests'] - requests
+            finally:
+                db.close()
+    finally:
+        await runner.cleanup()
+
+
+def read_table(database_file, table_name):
+    conn = sqlite3.connect(database_file)
+    try:
+        return pd.read_sql_query(f"SELECT * FROM {table_name} ORDER BY id", conn)
+    finally:
+        conn.close()
+
+
+def test_resumed_backfill_matches_an_uninterrupted_one(tmp_path, monkeypatch):
+    entities = load_entities(8000)
+    asyncio.run(sync(entities, ['trades.json'], tmp_path / 'expected.db', backfill=True))
+
+    # The process dies after committing three batches
+    write_batch = export_to_sqlite.write_batch
+    batches = []
+
+    def write_then_die(*args):
+        if len(batches) == 3:
+            raise RuntimeError("killed")
+        batches.append(write_batch(*args))
+        return batches[-1]
+
+    monkeypatch.setattr(export_to_sqlite, 'write_batch', write_then_die)
+    with pytest.raises(RuntimeError, match="killed"):
+        asyncio.run(sync(
+            entities, ['trades.json'], tmp_path / 'resumed.db', backfill=True, shards=4, batch_size=500))
+    monkeypatch.setattr(export_to_sqlite, 'write_batch', write_batch)
+
+    conn = sqlite3.connect(tmp_path / 'resumed.db')
+    shards = export_to_sqlite.get_backfill_shards(conn, 'trades')
+    conn.close()
+    assert len(shards) == 4
+    assert any(last_id != lower for lower, _, last_id in shards)
+
+    asyncio.run(sync(
+        entities, ['trades.json'], tmp_path / 'resumed.db', backfill=True, shards=4, batch_size=500))
+    expected = read_table(tmp_path / 'expected.db', 'trades')
+    assert expected.shape[0] == 8000
+    pd.testing.assert_frame_equal(read_table(tmp_path / 'resumed.db', 'trades'), expected)
+
+
+def keep_first_rows(database_file, table_name, num_rows):
+    """Delete all but the oldest rows of a table, as if it was last synced when they were the newest"""
+    conn = sqlite3.connect(database_file)
+    conn.execute(f"""
+        DELETE FROM {table_name} WHERE id NOT IN (
+            SELECT id FROM {table_name} ORDER BY timestamp, id LIMIT {num_rows}
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def test_refresh_pages_through_rows_sharing_a_timestamp(tmp_path):
+    entities = load_entities(3500)
+    # Spread over three seconds, so over a thousand rows share each timestamp
+    entities['futuresTrades'].span = 3
+    asyncio.run(sync(entities, ['trades.json'], tmp_path / 'trades.db', backfill=True))
+    expected = read_table(tmp_path / 'trades.db', 'trades')
+    assert expected['timestamp'].value_counts().min() > 1000
+
+    keep_first_rows(tmp_path / 'trades.db', 'trades', 10)
+    asyncio.run(sync(entities, ['trades.json'], tmp_path / 'trades.db'))
+    pd.testing.assert_frame_equal(read_table(tmp_path / 'trades.db', 'trades'), expected)
+
+
+def test_refresh_batch_keeps_paging_the_larger_entity(tmp_path):
+    entities = load_entities(3500, {'futuresMarginTransfers': 20})
+    config_names = ['trades.json', 'transfers.json']
+    asyncio.run(sync(entities, config_names, tmp_path / 'perps.db', backfill=True))
+    expected = {
+        table_name: read_table(tmp_path / 'perps.db', table_name) for table_name in ['trades', 'transfers']}
+
+    for table_name in expected:
+        keep_first_rows(tmp_path / 'perps.db', table_name, 5)
+    requests = asyncio.run(sync(entities, config_names, tmp_path / 'perps.db'))
+
+    # The transfers drop out of the batch after its first page
+    assert requests == 4
+    for table_name, table in expected.items():
+        pd.testing.assert_frame_equal(read_table(tmp_path / 'perps.db', table_name), table)
@@ -0,0 +1,28 @@
+import pytest
+from utils.metrics import Metrics, read_last_success
+
+
+def test_jobs_sharing_a_path_get_their_own_textfile(tmp_path):
+    path = str(tmp_path / 'kwenta_data.prom')
+    for job in ['export_to_sqlite', 'market_debt']:
+        metrics = Metrics()
+        with metrics.run(job, path):
+            metrics.observe('fetch', job, 0.5, rows=10)
+
+    for job in ['export_to_sqlite', 'market_debt']:
+        text = (tmp_path / f'kwenta_data_{job}.prom').read_text()
+        assert f'pipeline_rows_total{{job="{job}",stage="fetch",target="{job}"}} 10.0' in text
+        assert read_last_success(str(tmp_path / f'kwenta_data_{job}.prom'), job) is not None
+
+
+def test_failed_run_keeps_the_last_success(tmp_path):
+    path = str(tmp_path / 'kwenta_data.prom')
+    job_path = str(tmp_path / 'kwenta_data_market_debt.prom')
+    with Metrics().run('market_debt', path):
+        pass
+    last_success = read_last_success(job_path, 'market_debt')
+
+    with pytest.raises(RuntimeError):
+        with Metrics().run('market_debt', path):
+            raise RuntimeError("failed")
+    assert read_last_success(job_path, 'market_debt') == last_success
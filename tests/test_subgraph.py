@@ -0,0 +1,85 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from gql import Client, gql
+from gql.transport.exceptions import TransportServerError
+from utils.subgraph import SubgraphTransport, FetchController, EndpointPool
+
+QUERY = gql("""
+    query meta($retryAfter: String!) {
+        _meta {
+            deployment
+        }
+    }
+""")
+
+
+async def throttled(request):
+    # Each request names the Retry-After it gets back, and the first one
+    # is answered last
+    retry_after = (await request.json())['variables']['retryAfter']
+    await asyncio.sleep(0.1 if retry_after == '5' else 0)
+    return web.Response(status=429, text="Too Many Requests", headers={'Retry-After': retry_after})
+
+
+async def get_retry_delays(retry_afters):
+    app = web.Application()
+    app.router.add_post('/', throttled)
+    async with TestServer(app) as server:
+        transport = SubgraphTransport(url=str(server.make_url('/')))
+        async with Client(transport=transport) as session:
+            controller = FetchController(session, max_retries=0)
+
+            async def fetch(retry_after):
+                try:
+                    await controller.execute(QUERY, variable_values={'retryAfter': retry_after})
+                except TransportServerError as error:
+                    return controller.get_retry_delay(error, 0)
+
+            return await asyncio.gather(*[fetch(retry_after) for retry_after in retry_afters])
+
+
+def test_retry_after_is_read_from_the_throttled_response():
+    assert asyncio.run(get_retry_delays(['5'])) == [5]
+
+
+def test_concurrent_requests_keep_their_own_retry_after():
+    assert asyncio.run(get_retry_delays(['5', '7', '9'])) == [5, 7, 9]
+
+
+class FakeSession:
+    """A gql session that fails every query while `failing` is set"""
+
+    def __init__(self, name):
+        self.client = None
+        self.name = name
+        self.failing = False
+        self.calls = 0
+
+    async def execute(self, query, variable_values=None):
+        self.calls += 1
+        if self.failing:
+            raise TransportServerError("Internal Server Error", 500)
+        return {'endpoint': self.name}
+
+
+async def fail_over_and_recover():
+    primary, mirror = FakeSession('primary'), FakeSession('mirror')
+    # Default retries, without waiting between them
+    controllers = [FetchController(primary, base_delay=0), FetchController(mirror, base_delay=0)]
+    pool = EndpointPool(controllers, cooldown=0.2)
+
+    primary.failing = True
+    assert await pool.execute(QUERY) == {'endpoint': 'mirror'}
+    assert primary.calls == controllers[0].max_retries + 1
+    assert pool.is_degraded(controllers[0])
+    assert await pool.execute(QUERY) == {'endpoint': 'mirror'}
+
+    primary.failing = False
+    await asyncio.sleep(0.3)
+    assert not pool.is_degraded(controllers[0])
+    assert await pool.execute(QUERY) == {'endpoint': 'primary'}
+
+
+def test_failed_endpoint_recovers_after_cooldown():
+    asyncio.run(fail_over_and_recover())